@@ -0,0 +1,213 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy import text
+from backend.config import DB_DSN
+from backend.utils import embed_batch
+
+# Sweep HNSW build/query parameters on the local DB and measure build time, index size,
+# query latency and recall@k against exact brute-force results:
+#   python -m backend.ann_sweep --m 8,16,32 --ef-construction 32,64,128 --ef-search 10,20,40,80,160
+
+BASE_DIR = os.path.dirname(__file__)
+QUESTIONS_PATH = os.path.normpath(os.path.join(BASE_DIR, "..", "part1", "questions.json"))
+SCRATCH_TABLE = "ann_sweep_vectors"
+SCRATCH_INDEX = "idx_ann_sweep_vectors"
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def load_vectors(cx):
+    rows = cx.execute(text(
+        "SELECT game_id, embedding::real[] AS embedding FROM game_details WHERE embedding IS NOT NULL ORDER BY game_id"
+    )).all()
+    if not rows:
+        raise SystemExit("game_details has no embeddings, run backend.embed first")
+    return np.array([r.game_id for r in rows], dtype=np.int64), np.array([r.embedding for r in rows], dtype=np.float32)
+
+
+def synthetic_queries(cx, n, seed):
+    """Question-shaped texts about randomly sampled games"""
+    games = pd.read_sql(
+        "SELECT g.game_timestamp, g.season, ht.city || ' ' || ht.name AS home, at.city || ' ' || at.name AS away, "
+        "ht.name AS home_name, at.name AS away_name "
+        "FROM game_details g JOIN teams ht ON g.home_team_id = ht.team_id JOIN teams at ON g.away_team_id = at.team_id",
+        cx,
+    )
+    templates = [
+        "Who won the game between the {home} and {away} on {date}?",
+        "How many points did the {home_name} score against the {away_name} on {date}?",
+        "What was the final score of {away} at {home} in the {season} season?",
+        "{home_name} vs {away_name} {date}",
+        "game | season:{season} | date:{iso}",
+    ]
+    rng = random.Random(seed)
+    queries = []
+    for r in games.sample(n=min(n, len(games)), random_state=seed).itertuples(index=False):
+        ts = pd.to_datetime(r.game_timestamp)
+        queries.append(rng.choice(templates).format(
+            home=r.home, away=r.away, home_name=r.home_name, away_name=r.away_name,
+            date=ts.strftime("%B %d, %Y"), iso=ts.strftime("%Y-%m-%d"), season=int(r.season),
+        ))
+    return queries
+
+
+def exact_topk(matrix, ids, queries, k):
+    """Brute-force cosine neighbours, the ground truth for recall"""
+    m = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    sims = q @ m.T
+    top = np.argsort(-sims, axis=1)[:, :k]
+    return [set(ids[row].tolist()) for row in top]
+
+
+def run_queries(cx, queries, k):
+    lat, results = [], []
+    sql = text(f"SELECT game_id FROM {SCRATCH_TABLE} ORDER BY embedding <=> CAST(:q AS vector) LIMIT :k")
+    for qv in queries:
+        params = {"q": str(qv.tolist()), "k": k}
+        t0 = time.perf_counter()
+        rows = cx.execute(sql, params).scalars().all()
+        lat.append((time.perf_counter() - t0) * 1000)
+        results.append(set(int(r) for r in rows))
+    lat.sort()
+    return lat, results
+
+
+def recall(results, truth, k):
+    return statistics.mean(len(r & t) / k for r, t in zip(results, truth))
+
+
+def mark_pareto(rows):
+    """Flag settings where no other setting is at least as accurate and at least as fast"""
+    for r in rows:
+        r["pareto"] = not any(
+            o is not r and o["recall"] >= r["recall"] and o["p50_ms"] <= r["p50_ms"]
+            and (o["recall"] > r["recall"] or o["p50_ms"] < r["p50_ms"])
+            for o in rows
+        )
+
+
+def _label(value):
+    return "exact" if value is None else value
+
+
+def production_uses_index(cx, qvec):
+    """Whether the server/rag query shape can use the production HNSW index (operator matches the opclass)"""
+    # With seq scans allowed a table this small never shows the index, whatever the operator
+    cx.execute(text("SET enable_seqscan = off"))
+    plan = cx.execute(
+        text(
+            "EXPLAIN SELECT game_id FROM game_details WHERE embedding IS NOT NULL "
+            "ORDER BY embedding <=> CAST(:q AS vector) LIMIT 5"
+        ),
+        {"q": str(qvec.tolist())},
+    ).scalars().all()
+    cx.execute(text("RESET enable_seqscan"))
+    return any("idx_game_details_embedding" in line for line in plan)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="HNSW parameter sweep with recall/latency report")
+    ap.add_argument("--m", type=int_list, default=[8, 16, 32])
+    ap.add_argument("--ef-construction", type=int_list, default=[32, 64, 128])
+    ap.add_argument("--ef-search", type=int_list, default=[10, 20, 40, 80, 160])
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--synthetic", type=int, default=200, help="number of synthetic queries")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", default="ann_sweep.json")
+    args = ap.parse_args()
+
+    eng = sa.create_engine(DB_DSN)
+    with eng.connect() as cx:
+        ids, matrix = load_vectors(cx)
+        dim = matrix.shape[1]
+
+        with open(QUESTIONS_PATH, encoding="utf-8") as f:
+            texts = [q["question"] for q in json.load(f)]
+        n_questions = len(texts)
+        texts += synthetic_queries(cx, args.synthetic, args.seed)
+        print(f"Embedding {len(texts)} queries ({n_questions} from questions.json, {len(texts) - n_questions} synthetic)")
+        queries = np.array(embed_batch(texts), dtype=np.float32)
+        truth = exact_topk(matrix, ids, queries, args.k)
+        uses_index = production_uses_index(cx, queries[0])
+
+        # Scratch copy so the sweep never touches the production index
+        cx.execute(text(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}"))
+        cx.execute(text(f"CREATE TABLE {SCRATCH_TABLE} AS SELECT game_id, embedding FROM game_details WHERE embedding IS NOT NULL"))
+        cx.commit()
+
+        # Exact scan baseline
+        lat, results = run_queries(cx, queries, args.k)
+        rows = [{
+            "m": None, "ef_construction": None, "ef_search": None, "build_s": 0.0, "index_mb": 0.0,
+            "p50_ms": statistics.median(lat), "p95_ms": lat[int(0.95 * (len(lat) - 1))],
+            "recall": recall(results, truth, args.k),
+        }]
+
+        for m in args.m:
+            for efc in args.ef_construction:
+                cx.execute(text(f"DROP INDEX IF EXISTS {SCRATCH_INDEX}"))
+                t0 = time.perf_counter()
+                cx.execute(text(
+                    f"CREATE INDEX {SCRATCH_INDEX} ON {SCRATCH_TABLE} USING hnsw (embedding vector_cosine_ops) "
+                    f"WITH (m = {m}, ef_construction = {efc})"
+                ))
+                cx.commit()
+                build_s = time.perf_counter() - t0
+                size_mb = cx.execute(text(f"SELECT pg_relation_size('{SCRATCH_INDEX}')")).scalar() / 2 ** 20
+
+                # Small tables make a seq scan look cheaper to the planner, force the index
+                cx.execute(text("SET enable_seqscan = off"))
+                for efs in args.ef_search:
+                    cx.execute(text(f"SET hnsw.ef_search = {efs}"))
+                    lat, results = run_queries(cx, queries, args.k)
+                    rows.append({
+                        "m": m, "ef_construction": efc, "ef_search": efs, "build_s": build_s, "index_mb": size_mb,
+                        "p50_ms": statistics.median(lat), "p95_ms": lat[int(0.95 * (len(lat) - 1))],
+                        "recall": recall(results, truth, args.k),
+                    })
+                cx.execute(text("RESET enable_seqscan"))
+                cx.commit()
+                print(f"  m={m} ef_construction={efc}: built in {build_s:.2f}s, {size_mb:.2f} MB")
+
+        cx.execute(text(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}"))
+        cx.commit()
+
+    mark_pareto(rows)
+    header = f"{'m':>4} {'ef_c':>6} {'ef_s':>6} {'build_s':>8} {'idx_MB':>7} {'p50_ms':>8} {'p95_ms':>8} {f'recall@{args.k}':>10}  pareto"
+    print("\n" + header)
+    print("-" * len(header))
+    for r in rows:
+        print(
+            f"{_label(r['m']):>4} {_label(r['ef_construction']):>6} {_label(r['ef_search']):>6} "
+            f"{r['build_s']:>8.2f} {r['index_mb']:>7.2f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['recall']:>10.3f}  "
+            f"{'*' if r['pareto'] else ''}"
+        )
+    if not uses_index:
+        print("\nNote: the server/rag query shape can't use idx_game_details_embedding, "
+              "so ef_search has no effect on it; run backend.embed to (re)build the index.")
+
+    report = {
+        "k": args.k,
+        "dim": dim,
+        "vectors": len(ids),
+        "queries": {"questions": n_questions, "synthetic": len(texts) - n_questions},
+        "production_query_uses_index": uses_index,
+        "results": rows,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from backend.config import EMBED_BATCH_SIZE
+from backend.embed import row_text
+from backend.utils import embed, embed_batch, warm_up_embedder
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+HTTP_MODEL = os.getenv("BENCH_HTTP_MODEL", "nomic-embed-text")
+LOCAL_MODEL = os.getenv("BENCH_LOCAL_MODEL", "hf:nomic-ai/nomic-embed-text-v1.5")
+QUESTIONS = [
+    "How many points did the Warriors score against the Sacramento Kings on October 27, 2023?",
+    "Which team won the 2023 Christmas Day game between Golden State and Denver?",
+    "How many points did Luka Doncic score against the Hawks?",
+    "What was SGA's last game this year?",
+]
+
+# Compare the Ollama HTTP path against the in-process backend on the same workload:
+#   python -m backend.bench_embed [n_rows]
+
+
+def bench_single(model, n):
+    """Sequential per-request question embeddings, like /api/chat under light load"""
+    lat = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        embed(QUESTIONS[i % len(QUESTIONS)], model=model)
+        lat.append((time.perf_counter() - t0) * 1000)
+    lat.sort()
+    return {"p50_ms": statistics.median(lat), "p95_ms": lat[int(0.95 * (len(lat) - 1))]}
+
+
+def bench_concurrent(model, n, workers=8):
+    """Concurrent question embeddings, which the in-process backend coalesces into batches"""
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda i: embed(QUESTIONS[i % len(QUESTIONS)], model=model), range(n)))
+    return {"req_per_s": n / (time.perf_counter() - t0)}
+
+
+def bench_bulk(model, texts):
+    """embed.py-style bulk run over game rows"""
+    t0 = time.perf_counter()
+    dim = None
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        vecs = embed_batch(texts[start:start + EMBED_BATCH_SIZE], model=model)
+        dim = len(vecs[0])
+    return {"rows_per_s": len(texts) / (time.perf_counter() - t0), "dim": dim}
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    df = pd.read_csv(os.path.join(DATA_DIR, "game_details.csv")).head(n_rows)
+    texts = [row_text(r) for r in df.itertuples(index=False)]
+
+    results = {}
+    for label, model in [("http", HTTP_MODEL), ("local", LOCAL_MODEL)]:
+        print(f"Benchmarking {label} backend ({model})")
+        t0 = time.perf_counter()
+        warm_up_embedder(model)
+        embed(QUESTIONS[0], model=model)
+        startup = (time.perf_counter() - t0) * 1000
+        results[label] = {
+            "startup_ms": startup,
+            **bench_single(model, 50),
+            **bench_concurrent(model, 200),
+            **bench_bulk(model, texts),
+        }
+
+    cols = ["startup_ms", "p50_ms", "p95_ms", "req_per_s", "rows_per_s", "dim"]
+    print(f"\n{'backend':<8}" + "".join(f"{c:>12}" for c in cols))
+    for label, r in results.items():
+        print(f"{label:<8}" + "".join(f"{r[c]:>12.1f}" if isinstance(r[c], float) else f"{r[c]:>12}" for c in cols))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 import pandas as pd
 import sqlalchemy as sa
 from sqlalchemy import text
-from backend.config import DB_DSN, EMBED_MODEL
-from backend.utils import ollama_embed
+from backend import snapshot
+from backend.config import DB_DSN, EMBED_BATCH_SIZE, EMBED_DIM, HNSW_M, HNSW_EF_CONSTRUCTION
+from backend.utils import embed_batch
 
 # Example of a row embedding for the game_details table
 # TODO: Customize this
@@ -31,15 +32,26 @@ def main():
     with eng.begin() as cx:
         cx.execute(text('ALTER DATABASE nba REFRESH COLLATION VERSION'))
         # TODO: Try with different embeddings, feel free to try different index type/distance functions as well
-        cx.execute(text("ALTER TABLE IF EXISTS game_details ADD COLUMN IF NOT EXISTS embedding vector(768);"))
-        cx.execute(text("CREATE INDEX IF NOT EXISTS idx_game_details_embedding ON game_details USING hnsw (embedding vector_cosine_ops);"))
+        cx.execute(text(f"ALTER TABLE IF EXISTS game_details ADD COLUMN IF NOT EXISTS embedding vector({EMBED_DIM});"))
+        cx.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_game_details_embedding ON game_details USING hnsw (embedding vector_cosine_ops) "
+            f"WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION});"
+        ))
         df = pd.read_sql(
             "SELECT game_id, season, game_timestamp, home_team_id, away_team_id, home_points, away_points FROM game_details ORDER BY game_timestamp DESC, game_id DESC",
             cx,
         )
-        for _, r in df.iterrows():
-            vec = ollama_embed(EMBED_MODEL, row_text(r))
-            cx.execute(text("UPDATE game_details SET embedding = :v WHERE game_id = :gid"), {"v": vec, "gid": int(r.game_id)})
+        texts = [row_text(r) for r in df.itertuples(index=False)]
+        game_ids = [int(g) for g in df.game_id]
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            vecs = embed_batch(texts[start:start + EMBED_BATCH_SIZE])
+            cx.execute(
+                text("UPDATE game_details SET embedding = :v WHERE game_id = :gid"),
+                [{"v": v, "gid": gid} for v, gid in zip(vecs, game_ids[start:start + EMBED_BATCH_SIZE])],
+            )
+    # A new generation makes running servers drop answers cached from the old embeddings
+    with eng.begin() as cx:
+        snapshot.publish(cx)
     print(f"Finished Embeddings: {len(df)} Rows Updated")
 
 
@@ -0,0 +1,206 @@
+import json
+import os
+import sys
+import time
+import numpy as np
+import sqlalchemy as sa
+from sqlalchemy import text
+from backend.config import DB_DSN, EMBED_MODEL, EVAL_SNAPSHOT_DIR
+from backend.snapshot import str_array
+
+# Columnar export of everything rag.py retrieves, so evaluation runs without Postgres:
+#   python -m backend.eval_snapshot [DIR]     # export from the DB
+#   python -m backend.rag --offline [DIR]     # answer questions from the export
+#   python -m backend.rag --compare [DIR]     # check the export retrieves the same as Postgres
+#
+# Team/player names are pre-joined onto each row and box scores are sorted by game with
+# per-game offsets, so lookups are vectorised numpy work on memory-mapped arrays.
+
+
+def export(cx, out_dir=EVAL_SNAPSHOT_DIR):
+    """Write games, embeddings and box scores with their join keys resolved"""
+    games = cx.execute(text(
+        "SELECT g.game_id, g.game_timestamp, g.home_team_id, ht.city || ' ' || ht.name AS home_team, "
+        "g.away_team_id, at.city || ' ' || at.name AS away_team, g.home_points, g.away_points, "
+        "g.embedding::real[] AS embedding "
+        "FROM game_details g "
+        "JOIN teams ht ON g.home_team_id = ht.team_id "
+        "JOIN teams at ON g.away_team_id = at.team_id "
+        "ORDER BY g.game_id"
+    )).mappings().all()
+    # Same inner joins as retrieve_player_stats, so rows it would drop are dropped here too
+    box = cx.execute(text(
+        "SELECT p.game_id, p.person_id AS player_id, (pl.first_name || ' ' || pl.last_name) AS player_name, "
+        "p.points, (p.offensive_reb + p.defensive_reb) AS rebounds, p.assists, p.team_id, "
+        "t.city || ' ' || t.name AS team_name "
+        "FROM player_box_scores p "
+        "JOIN players pl ON p.person_id = pl.player_id "
+        "JOIN game_details g ON p.game_id = g.game_id "
+        "JOIN teams t ON p.team_id = t.team_id "
+        "ORDER BY p.game_id, p.person_id"
+    )).mappings().all()
+    teams = cx.execute(text("SELECT team_id, city, name, abbreviation FROM teams ORDER BY team_id")).all()
+
+    embedded = [g["embedding"] for g in games if g["embedding"] is not None]
+    if not embedded:
+        raise SystemExit("game_details has no embeddings, run backend.embed first")
+    dim = len(embedded[0])
+    matrix = np.zeros((len(games), dim), dtype=np.float32)
+    has_embedding = np.zeros(len(games), dtype=bool)
+    for i, g in enumerate(games):
+        if g["embedding"] is not None:
+            matrix[i] = g["embedding"]
+            has_embedding[i] = True
+
+    game_ids = np.array([g["game_id"] for g in games], dtype=np.int64)
+    box_game_ids = np.array([b["game_id"] for b in box], dtype=np.int64)
+    arrays = {
+        "game_id": game_ids,
+        "game_timestamp": str_array(g["game_timestamp"] for g in games),
+        # Game day as YYYYMMDD so date-range lookups are integer comparisons
+        "game_day": np.array([int(g["game_timestamp"][:10].replace("-", "")) for g in games], dtype=np.int32),
+        "home_team_id": np.array([g["home_team_id"] for g in games], dtype=np.int64),
+        "home_team": str_array(g["home_team"] for g in games),
+        "away_team_id": np.array([g["away_team_id"] for g in games], dtype=np.int64),
+        "away_team": str_array(g["away_team"] for g in games),
+        "home_points": np.array([g["home_points"] for g in games], dtype=np.int64),
+        "away_points": np.array([g["away_points"] for g in games], dtype=np.int64),
+        "embedding": matrix,
+        "has_embedding": has_embedding,
+        "box_game_id": box_game_ids,
+        # Row of each box score's game in the game arrays
+        "box_game_row": np.searchsorted(game_ids, box_game_ids).astype(np.int64),
+        # Box scores for game_ids[i] are box_*[box_offsets[i]:box_offsets[i + 1]]
+        "box_offsets": np.searchsorted(box_game_ids, np.append(game_ids, np.iinfo(np.int64).max)).astype(np.int64),
+        "box_player_id": np.array([b["player_id"] for b in box], dtype=np.int64),
+        "box_player_name": str_array(b["player_name"] for b in box),
+        "box_points": np.array([b["points"] for b in box], dtype=np.int64),
+        "box_rebounds": np.array([b["rebounds"] for b in box], dtype=np.int64),
+        "box_assists": np.array([b["assists"] for b in box], dtype=np.int64),
+        "box_team_id": np.array([b["team_id"] for b in box], dtype=np.int64),
+        "box_team_name": str_array(b["team_name"] for b in box),
+        "team_id": np.array([t.team_id for t in teams], dtype=np.int64),
+        "team_city": str_array(t.city for t in teams),
+        "team_name": str_array(t.name for t in teams),
+        "team_abbr": str_array(t.abbreviation for t in teams),
+    }
+
+    os.makedirs(out_dir, exist_ok=True)
+    for key, arr in arrays.items():
+        np.save(os.path.join(out_dir, f"{key}.npy"), arr)
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "created": time.time(), "embed_model": EMBED_MODEL, "dim": dim,
+            "games": len(games), "box_scores": len(box), "arrays": sorted(arrays),
+        }, f, indent=2)
+    print(f"Exported {len(games)} games and {len(box)} box scores to {out_dir}")
+
+
+class OfflineStore:
+    """Answers rag.py's retrieval queries from an export, matching rag.DbStore's SQL.
+
+    Vector search here is exact brute force, like DbStore's default full scan. The server's HNSW
+    search is approximate, so it can rank a different game in when recall at HNSW_EF_SEARCH is below 1.
+    """
+
+    def __init__(self, path=EVAL_SNAPSHOT_DIR):
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest["embed_model"] != EMBED_MODEL:
+            print(f"Warning: export was embedded with {self.manifest['embed_model']}, questions will use {EMBED_MODEL}")
+        self.a = {k: np.load(os.path.join(path, f"{k}.npy"), mmap_mode="r") for k in self.manifest["arrays"]}
+        self.teams = list(zip(
+            self.a["team_id"].tolist(), self.a["team_city"].tolist(),
+            self.a["team_name"].tolist(), self.a["team_abbr"].tolist(),
+        ))
+        # Games without an embedding are skipped, like the SQL path's WHERE embedding IS NOT NULL
+        self._embedded_rows = np.flatnonzero(self.a["has_embedding"])
+        m = self.a["embedding"]
+        if len(self._embedded_rows) < len(m):
+            m = m[self._embedded_rows]  # one copy here rather than one per query
+        self._matrix = m
+        self._norms = np.linalg.norm(m, axis=1)
+
+    def _game_row(self, i, score=None):
+        a = self.a
+        home_points, away_points = int(a["home_points"][i]), int(a["away_points"][i])
+        row = {
+            "game_id": int(a["game_id"][i]),
+            "game_timestamp": str(a["game_timestamp"][i]),
+            "home_team_id": int(a["home_team_id"][i]),
+            "home_team": str(a["home_team"][i]),
+            "away_team_id": int(a["away_team_id"][i]),
+            "away_team": str(a["away_team"][i]),
+            "home_points": home_points,
+            "away_points": away_points,
+            "winner": str(a["home_team"][i]) if home_points > away_points else str(a["away_team"][i]),
+        }
+        if score is not None:
+            row["score"] = score
+        return row
+
+    def retrieve_games(self, qvec, k=10):
+        """Exact cosine nearest embedded games, like DbStore's full-scan ORDER BY embedding <=> q"""
+        q = np.asarray(qvec, dtype=np.float32)
+        cos = (self._matrix @ q) / (self._norms * np.linalg.norm(q))
+        top = np.argsort(-cos, kind="stable")[:k]
+        return [self._game_row(self._embedded_rows[i], float(cos[i])) for i in top]
+
+    def retrieve_player_stats(self, game_ids, limit=20):
+        """Box scores for the games, best points/rebounds/assists first"""
+        if not game_ids:
+            return []
+        a = self.a
+        rows = np.flatnonzero(np.isin(a["game_id"], np.asarray(game_ids, dtype=np.int64)))
+        offsets = a["box_offsets"]
+        idx = np.concatenate([np.arange(offsets[r], offsets[r + 1], dtype=np.int64) for r in rows] or [np.zeros(0, np.int64)])
+        order = np.lexsort((-a["box_assists"][idx], -a["box_rebounds"][idx], -a["box_points"][idx]))[:limit]
+        out = []
+        for b in idx[order]:
+            g = int(a["box_game_row"][b])
+            out.append({
+                "game_id": int(a["box_game_id"][b]),
+                "player_id": int(a["box_player_id"][b]),
+                "player_name": str(a["box_player_name"][b]),
+                "points": int(a["box_points"][b]),
+                "rebounds": int(a["box_rebounds"][b]),
+                "assists": int(a["box_assists"][b]),
+                "team_id": int(a["box_team_id"][b]),
+                "team_name": str(a["box_team_name"][b]),
+                "game_timestamp": str(a["game_timestamp"][g]),
+                "home_team": str(a["home_team"][g]),
+                "away_team": str(a["away_team"][g]),
+                "home_points": int(a["home_points"][g]),
+                "away_points": int(a["away_points"][g]),
+            })
+        return out
+
+    def exact_game_lookup(self, parsed, k=10, latest=False):
+        """Same filter as query_parser.exact_game_lookup, over the game arrays"""
+        a = self.a
+        day = a["game_day"]
+        mask = np.ones(len(day), dtype=bool)
+        if parsed.date_from is not None:
+            mask &= (day >= int(parsed.date_from.strftime("%Y%m%d"))) & (day < int(parsed.date_to.strftime("%Y%m%d")))
+        home, away = a["home_team_id"], a["away_team_id"]
+        if len(parsed.team_ids) >= 2:
+            t0, t1 = parsed.team_ids[:2]
+            mask &= ((home == t0) & (away == t1)) | ((home == t1) & (away == t0))
+        elif parsed.team_ids:
+            mask &= (home == parsed.team_ids[0]) | (away == parsed.team_ids[0])
+        rows = np.flatnonzero(mask)
+        rows = rows[np.argsort(a["game_timestamp"][rows], kind="stable")]
+        # Wide or missing ranges get the latest k games, still oldest first
+        rows = rows[-k:] if latest or not parsed.narrow else rows[:k]
+        return [self._game_row(i) for i in rows]
+
+
+def main():
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else EVAL_SNAPSHOT_DIR
+    eng = sa.create_engine(DB_DSN)
+    with eng.begin() as cx:
+        export(cx, out_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,10 @@ import pandas as pd
 import sqlalchemy as sa
 from sqlalchemy import text
 from pathlib import Path
+from backend import snapshot
 from backend.config import DB_DSN
+from backend.query_parser import create_lookup_indexes
+from backend.stream_ingest import ensure_upsert_keys
 
 TABLES = ["game_details", "player_box_scores", "players", "teams"]
 DATA_DIR = Path(__file__).resolve().parent / "data"
@@ -18,6 +21,12 @@ def main():
             path = os.path.join(DATA_DIR, f"{t}.csv")
             df = pd.read_csv(path)
             df.to_sql(t, cx, if_exists="replace", index=False, method="multi", chunksize=5000)
+        # Replacing the tables drops their indexes, so recreate the ones exact date/team lookups rely on
+        create_lookup_indexes(cx)
+        ensure_upsert_keys(cx)
+    # Running servers pick up the new roster without a restart
+    with eng.begin() as cx:
+        snapshot.publish(cx)
     print('Finished Database Ingestion')
 
 
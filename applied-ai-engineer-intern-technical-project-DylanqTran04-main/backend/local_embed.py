@@ -0,0 +1,103 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+import torch.nn.functional as F
+from transformers import AutoModel, AutoTokenizer
+from backend.config import EMBED_BATCH_SIZE, EMBED_DIM, EMBED_MAX_WAIT_MS, EMBED_THREADS
+from backend.utils import LOCAL_EMBED_PREFIX
+
+_embedders = {}
+_embedders_lock = threading.Lock()
+
+
+class LocalEmbedder:
+    """Sentence-embedding model kept resident in-process on CPU"""
+
+    def __init__(self, model_name, batch_size=EMBED_BATCH_SIZE, max_wait_ms=EMBED_MAX_WAIT_MS):
+        if model_name.startswith(LOCAL_EMBED_PREFIX):
+            model_name = model_name[len(LOCAL_EMBED_PREFIX):]
+        torch.set_num_threads(EMBED_THREADS)
+        # Tokenization and the forward pass already use the intra-op pool, extra inter-op threads only contend
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # Can only be set once per process, before any parallel work
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
+        self.model = AutoModel.from_pretrained(model_name, trust_remote_code=True)
+        self.model.eval()
+
+        self._pending = queue.Queue()
+        self._worker = threading.Thread(target=self._batch_loop, name="embed-batcher", daemon=True)
+        self._worker.start()
+
+    def _encode(self, texts):
+        """Mean-pooled, L2-normalised embeddings sized to the stored index dimension"""
+        enc = self.tokenizer(texts, padding=True, truncation=True, max_length=512, return_tensors="pt")
+        with torch.inference_mode():
+            hidden = self.model(**enc).last_hidden_state
+            mask = enc["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            if pooled.shape[1] < EMBED_DIM:
+                raise ValueError(
+                    f"{self.model_name} produces {pooled.shape[1]}-dim vectors but the index expects {EMBED_DIM}"
+                )
+            # Matryoshka-style truncation keeps larger models usable against the existing vector(EMBED_DIM) column
+            pooled = F.normalize(pooled[:, :EMBED_DIM], p=2, dim=1)
+        return pooled.tolist()
+
+    def embed_batch(self, texts):
+        """Embed many texts, grouping similar lengths together to minimise padding"""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            for i, vec in zip(idx, self._encode([texts[i] for i in idx])):
+                out[i] = vec
+        return out
+
+    def embed(self, text):
+        """Embed one text, coalescing with any concurrent callers into a single forward pass"""
+        fut = Future()
+        self._pending.put((text, fut))
+        return fut.result()
+
+    def _batch_loop(self):
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                vecs = self._encode([t for t, _ in batch])
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), vec in zip(batch, vecs):
+                fut.set_result(vec)
+
+    def warm_up(self):
+        """Run a throwaway batch so the first real request doesn't pay for lazy init"""
+        self._encode(["warm up"] * min(self.batch_size, 4))
+
+
+def get_embedder(model_name):
+    """Process-wide embedder per model, loaded on first use"""
+    with _embedders_lock:
+        if model_name not in _embedders:
+            print(f"Loading in-process embedding model {model_name}")
+            _embedders[model_name] = LocalEmbedder(model_name)
+        return _embedders[model_name]
@@ -0,0 +1,288 @@
+import re
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from functools import lru_cache
+from sqlalchemy import text
+
+# Turns the date and matchup parts of a question into a half-open date range plus team ids,
+# so the most common question shape ("<team> vs <team> on <date>") becomes a keyed lookup
+# on (game day, home/away team) instead of a vector search.
+
+MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3, "apr": 4, "april": 4,
+    "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7, "aug": 8, "august": 8, "sep": 9, "sept": 9,
+    "september": 9, "oct": 10, "october": 10, "nov": 11, "november": 11, "dec": 12, "december": 12,
+}
+MONTH_RE = "|".join(sorted(MONTHS, key=len, reverse=True))
+
+SEASON_LABEL_RE = re.compile(r"\b(20\d{2})\s*[-–/]\s*(20\d{2}|\d{2})\b")
+SEASON_PHRASE_RE = re.compile(r"\b(20\d{2})\s+(?:nba\s+)?(?:regular\s+)?season\b")
+MONTH_DAY_RE = re.compile(rf"\b({MONTH_RE})\.?\s+(\d{{1,2}})(?:st|nd|rd|th)?\b(?:,?\s+(20\d{{2}})\b)?")
+ISO_DATE_RE = re.compile(r"\b(20\d{2})-(\d{1,2})-(\d{1,2})\b")
+# "/" with or without a year, "-" only with one, so scores and runs ("10-2 run", "4-1 series") aren't dates
+NUMERIC_DATE_RE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{4}|\d{2}))?\b|\b(\d{1,2})-(\d{1,2})-(\d{4}|\d{2})\b")
+YEAR_RE = re.compile(r"\b(20\d{2})\b")
+LAST_N_DAYS_RE = re.compile(r"\b(?:last|past)\s+(\d{1,3})\s+days\b")
+
+# Nicknames and short forms fans use that aren't a team's city, name or abbreviation
+EXTRA_TEAM_ALIASES = {
+    "mavs": "DAL", "sixers": "PHI", "cavs": "CLE", "wolves": "MIN", "t-wolves": "MIN", "blazers": "POR",
+    "dubs": "GSW", "nola": "NOP", "la lakers": "LAL", "l.a. lakers": "LAL", "los angeles clippers": "LAC",
+    "la clippers": "LAC", "l.a. clippers": "LAC", "okc": "OKC",
+}
+
+
+@dataclass
+class ParsedQuery:
+    date_from: date = None  # inclusive
+    date_to: date = None  # exclusive
+    team_ids: list = field(default_factory=list)
+    season: int = None  # season start year, e.g. 2023 for 2023-24
+    source: str = None  # what produced the date range, for logging
+
+    @property
+    def narrow(self):
+        """Whether the date range is short enough that a lookup can list every game in it"""
+        return self.date_from is not None and self.date_to - self.date_from <= timedelta(days=31)
+
+    @property
+    def exact(self):
+        """Whether this can be answered by an indexed lookup instead of vector search"""
+        if len(self.team_ids) >= 2:
+            # A matchup is selective on its own; without dates it means the latest meetings
+            return True
+        # One team plays ~40 games in a season, more than a lookup lists, so wide ranges stay on search
+        return self.narrow
+
+
+def season_range(season):
+    return date(season, 8, 1), date(season + 1, 8, 1)
+
+
+def current_season(today):
+    return today.year if today.month >= 8 else today.year - 1
+
+
+def _nth_weekday(year, month, weekday, n):
+    d = date(year, month, 1)
+    d += timedelta(days=(weekday - d.weekday()) % 7)
+    return d + timedelta(weeks=n - 1)
+
+
+HOLIDAYS = [
+    # (pattern, month of the occurrence, date for a calendar year)
+    (re.compile(r"\bnew year'?s eve\b"), 12, lambda y: date(y, 12, 31)),
+    (re.compile(r"\bnew year'?s(?: day)?\b"), 1, lambda y: date(y, 1, 1)),
+    (re.compile(r"\bchristmas(?: day)?\b|\bxmas\b"), 12, lambda y: date(y, 12, 25)),
+    (re.compile(r"\bmlk(?: jr\.?)? day\b|\bmartin luther king(?: jr\.?)? day\b"), 1, lambda y: _nth_weekday(y, 1, 0, 3)),
+    (re.compile(r"\bthanksgiving\b"), 11, lambda y: _nth_weekday(y, 11, 3, 4)),
+    (re.compile(r"\bhalloween\b"), 10, lambda y: date(y, 10, 31)),
+    (re.compile(r"\bvalentine'?s(?: day)?\b"), 2, lambda y: date(y, 2, 14)),
+]
+
+
+def _year_for(month, season, year, today):
+    """Calendar year for a month given without a year"""
+    if season is not None:
+        return season if month >= 8 else season + 1
+    if year is not None:
+        return year
+    return today.year if month <= today.month else today.year - 1
+
+
+def _safe_date(y, m, d):
+    try:
+        return date(y, m, d)
+    except ValueError:
+        return None
+
+
+class TeamMatcher:
+    """Finds teams mentioned by city, name, city + name, abbreviation or common nickname"""
+
+    def __init__(self, teams):
+        by_abbr = {abbr: team_id for team_id, _, _, abbr in teams}
+        aliases = {}
+        for team_id, city, name, abbr in teams:
+            aliases[name.lower()] = team_id
+            aliases[f"{city} {name}".lower()] = team_id
+            aliases.setdefault(city.lower(), team_id)
+        for alias, abbr in EXTRA_TEAM_ALIASES.items():
+            if abbr in by_abbr:
+                aliases[alias] = by_abbr[abbr]
+        # Longest alias wins, so "la lakers" beats "la" (the Clippers' city)
+        self.patterns = [
+            (re.compile(r"(?<![\w.])" + re.escape(a) + r"(?![\w])"), team_id)
+            for a, team_id in sorted(aliases.items(), key=lambda kv: -len(kv[0]))
+        ]
+        # Abbreviations only in capitals: "WAS" and "MIN" are also ordinary words
+        self.abbr_pattern = re.compile(r"\b(" + "|".join(map(re.escape, by_abbr)) + r")\b")
+        self.by_abbr = by_abbr
+
+    def find(self, question):
+        lowered = question.lower()
+        taken = []
+        hits = []
+        for pattern, team_id in self.patterns:
+            for m in pattern.finditer(lowered):
+                if not any(m.start() < e and s < m.end() for s, e in taken):
+                    taken.append((m.start(), m.end()))
+                    hits.append((m.start(), team_id))
+        for m in self.abbr_pattern.finditer(question):
+            if not any(m.start() < e and s < m.end() for s, e in taken):
+                hits.append((m.start(), self.by_abbr[m.group(1)]))
+        out = []
+        for _, team_id in sorted(hits):
+            if team_id not in out:
+                out.append(team_id)
+        return out
+
+
+@lru_cache(maxsize=8)
+def _matcher(teams):
+    return TeamMatcher(teams)
+
+
+def parse_question(question, teams, today=None):
+    """Extract a date range and team ids from a question.
+
+    `teams` is a sequence of (team_id, city, name, abbreviation) tuples.
+    """
+    today = today or date.today()
+    q = question.lower().replace("’", "'")
+    parsed = ParsedQuery(team_ids=_matcher(tuple(teams)).find(question.replace("’", "'")))
+
+    # Season labels first, and blanked out so "2023-24" isn't read as a date or a bare year
+    m = SEASON_LABEL_RE.search(q)
+    if m and int(m.group(2)[-2:]) == (int(m.group(1)) + 1) % 100:
+        parsed.season = int(m.group(1))
+        q = q[:m.start()] + " " * (m.end() - m.start()) + q[m.end():]
+    else:
+        m = SEASON_PHRASE_RE.search(q)
+        if m:
+            parsed.season = int(m.group(1))
+            q = q[:m.start()] + " " * (m.end() - m.start()) + q[m.end():]
+
+    day = None
+    m = ISO_DATE_RE.search(q)
+    if m:
+        day = _safe_date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        q = q[:m.start()] + " " * (m.end() - m.start()) + q[m.end():]
+
+    year_match = YEAR_RE.search(q) if day is None else None
+    year = int(year_match.group(1)) if year_match else None
+
+    if day is None:
+        m = MONTH_DAY_RE.search(q)
+        if m:
+            month = MONTHS[m.group(1)]
+            y = int(m.group(3)) if m.group(3) else _year_for(month, parsed.season, year, today)
+            day = _safe_date(y, month, int(m.group(2)))
+    if day is None:
+        for m in NUMERIC_DATE_RE.finditer(q):
+            month, dom, y = m.group(1, 2, 3) if m.group(1) else m.group(4, 5, 6)
+            month, dom = int(month), int(dom)
+            if not (1 <= month <= 12 and 1 <= dom <= 31):
+                continue
+            if y:
+                y = int(y)
+                y = y + 2000 if y < 100 else y
+            else:
+                y = _year_for(month, parsed.season, year, today)
+            day = _safe_date(y, month, dom)
+            if day:
+                break
+
+    if day is not None:
+        parsed.date_from, parsed.date_to, parsed.source = day, day + timedelta(days=1), "date"
+        return parsed
+
+    for pattern, month, on in HOLIDAYS:
+        if pattern.search(q):
+            if parsed.season is not None or year is not None:
+                y = _year_for(month, parsed.season, year, today)
+            else:
+                # Most recent occurrence
+                y = today.year if on(today.year) <= today else today.year - 1
+            day = on(y)
+            parsed.date_from, parsed.date_to, parsed.source = day, day + timedelta(days=1), "holiday"
+            return parsed
+
+    if re.search(r"\b(yesterday|last night)\b", q):
+        parsed.date_from, parsed.date_to, parsed.source = today - timedelta(days=1), today, "relative"
+    elif re.search(r"\b(today|tonight)\b", q):
+        parsed.date_from, parsed.date_to, parsed.source = today, today + timedelta(days=1), "relative"
+    elif LAST_N_DAYS_RE.search(q):
+        n = int(LAST_N_DAYS_RE.search(q).group(1))
+        parsed.date_from, parsed.date_to, parsed.source = today - timedelta(days=n), today + timedelta(days=1), "relative"
+    elif re.search(r"\b(last|past) week\b", q):
+        parsed.date_from, parsed.date_to, parsed.source = today - timedelta(days=7), today + timedelta(days=1), "relative"
+    elif re.search(r"\bthis week\b", q):
+        start = today - timedelta(days=today.weekday())
+        parsed.date_from, parsed.date_to, parsed.source = start, today + timedelta(days=1), "relative"
+    elif re.search(r"\blast month\b", q):
+        end = today.replace(day=1)
+        parsed.date_from, parsed.date_to, parsed.source = (end - timedelta(days=1)).replace(day=1), end, "relative"
+    elif re.search(r"\bthis month\b", q):
+        parsed.date_from, parsed.date_to, parsed.source = today.replace(day=1), today + timedelta(days=1), "relative"
+    elif re.search(r"\b(last year|last season)\b", q):
+        parsed.season = current_season(today) - 1
+    elif re.search(r"\b(this year|this season)\b", q):
+        parsed.season = current_season(today)
+    if parsed.date_from is not None:
+        return parsed
+
+    if parsed.season is not None:
+        parsed.date_from, parsed.date_to = season_range(parsed.season)
+        parsed.source = "season"
+    elif year is not None:
+        parsed.date_from, parsed.date_to, parsed.source = date(year, 1, 1), date(year + 1, 1, 1), "year"
+    return parsed
+
+
+def exact_game_lookup(cx, parsed, k=10, latest=False):
+    """Games in the parsed date range involving the parsed team(s), via the (team, game day) indexes.
+
+    Narrow ranges return the first k games. Without a range, for a wide one, or with latest set this
+    returns the latest k games instead, still oldest first.
+    """
+    where, params = [], {"k": k}
+    if parsed.date_from is not None:
+        where += ["LEFT(g.game_timestamp, 10) >= :d0", "LEFT(g.game_timestamp, 10) < :d1"]
+        params.update(d0=parsed.date_from.isoformat(), d1=parsed.date_to.isoformat())
+    if len(parsed.team_ids) >= 2:
+        where.append(
+            "((g.home_team_id = :t0 AND g.away_team_id = :t1) OR (g.home_team_id = :t1 AND g.away_team_id = :t0))"
+        )
+        params.update(t0=parsed.team_ids[0], t1=parsed.team_ids[1])
+    elif parsed.team_ids:
+        where.append("(g.home_team_id = :t0 OR g.away_team_id = :t0)")
+        params["t0"] = parsed.team_ids[0]
+    sql = (
+        "SELECT g.game_id, g.game_timestamp, "
+        "g.home_team_id, ht.city || ' ' || ht.name as home_team, "
+        "g.away_team_id, at.city || ' ' || at.name as away_team, "
+        "g.home_points, g.away_points, "
+        "CASE WHEN g.home_points > g.away_points THEN ht.city || ' ' || ht.name "
+        "     ELSE at.city || ' ' || at.name END as winner "
+        "FROM game_details g "
+        "JOIN teams ht ON g.home_team_id = ht.team_id "
+        "JOIN teams at ON g.away_team_id = at.team_id "
+        + (f"WHERE {' AND '.join(where)} " if where else "")
+    )
+    if latest or not parsed.narrow:
+        sql = f"SELECT * FROM ({sql} ORDER BY g.game_timestamp DESC LIMIT :k) latest ORDER BY game_timestamp ASC"
+    else:
+        sql += "ORDER BY g.game_timestamp ASC LIMIT :k"
+    return cx.execute(text(sql), params).mappings().all()
+
+
+def create_lookup_indexes(cx):
+    """Indexes backing exact_game_lookup; game_timestamp is ISO text so its first 10 chars are the game day"""
+    cx.execute(text("CREATE INDEX IF NOT EXISTS idx_game_details_day ON game_details ((LEFT(game_timestamp, 10)))"))
+    cx.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_game_details_home_day ON game_details (home_team_id, (LEFT(game_timestamp, 10)))"
+    ))
+    cx.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_game_details_away_day ON game_details (away_team_id, (LEFT(game_timestamp, 10)))"
+    ))
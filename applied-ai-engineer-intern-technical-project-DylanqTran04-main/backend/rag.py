@@ -1,18 +1,28 @@
+import argparse
 import os
 import json
 import re
+import time
 import sqlalchemy as sa
 from sqlalchemy import text
-from backend.config import DB_DSN, EMBED_MODEL, LLM_MODEL
-from backend.utils import ollama_embed, ollama_generate
+from backend.config import BREAKER_RESET_SECONDS, DB_DSN, EVAL_SNAPSHOT_DIR, GEN_BATCH_RETRIES, HNSW_EF_SEARCH, LLM_MODEL
+from backend.eval_snapshot import OfflineStore
+from backend.query_parser import exact_game_lookup, parse_question
+from backend.resilience import ModelUnavailable
+from backend.scheduler import BATCH, Overloaded
+from backend.utils import embed, ollama_generate, warm_up_embedder
 
 BASE_DIR = os.path.dirname(__file__)
 QUESTIONS_PATH = os.path.normpath(os.path.join(BASE_DIR, "..", "part1", "questions.json"))
 ANSWERS_PATH = os.path.normpath(os.path.join(BASE_DIR, "..", "part1", "answers.json"))
 
 
-def retrieve_games(cx, qvec, k=10):
-    """Retrieve relevant games using vector similarity"""
+def retrieve_games(cx, qvec, k=10, exact=False):
+    """Retrieve relevant games using vector similarity.
+
+    By default this goes through the HNSW index like the server, which is approximate; `exact`
+    forces a full scan so results match the offline export's brute-force search.
+    """
     sql = (
         "SELECT g.game_id, g.game_timestamp, "
         "g.home_team_id, ht.city || ' ' || ht.name as home_team, "
@@ -24,9 +34,18 @@ def retrieve_games(cx, qvec, k=10):
         "FROM game_details g "
         "JOIN teams ht ON g.home_team_id = ht.team_id "
         "JOIN teams at ON g.away_team_id = at.team_id "
-        "ORDER BY g.embedding <-> (:q)::vector LIMIT :k"
+        "WHERE g.embedding IS NOT NULL "
+        "ORDER BY g.embedding <=> (:q)::vector LIMIT :k"
     )
-    return cx.execute(text(sql), {"q": qvec, "k": k}).mappings().all()
+    if exact:
+        cx.execute(text("SET LOCAL enable_indexscan = off"))
+    else:
+        cx.execute(text(f"SET LOCAL hnsw.ef_search = {HNSW_EF_SEARCH}"))
+    rows = cx.execute(text(sql), {"q": qvec, "k": k}).mappings().all()
+    if exact:
+        # The rest of the transaction (exact lookups) still wants its btree indexes
+        cx.execute(text("RESET enable_indexscan"))
+    return rows
 
 
 def retrieve_player_stats(cx, game_ids):
@@ -58,6 +77,28 @@ def retrieve_player_stats(cx, game_ids):
     return cx.execute(text(sql), {"game_ids": tuple(game_ids)}).mappings().all()
 
 
+class DbStore:
+    """Postgres retrieval, the same interface as eval_snapshot.OfflineStore.
+
+    Vector search is an exact scan by default so evaluation runs give the same answers online and
+    offline; exact=False measures the server's approximate HNSW search instead.
+    """
+
+    def __init__(self, cx, exact=True):
+        self.cx = cx
+        self.exact = exact
+        self.teams = [tuple(r) for r in cx.execute(text("SELECT team_id, city, name, abbreviation FROM teams")).all()]
+
+    def retrieve_games(self, qvec, k=10):
+        return retrieve_games(self.cx, qvec, k, self.exact)
+
+    def retrieve_player_stats(self, game_ids):
+        return retrieve_player_stats(self.cx, game_ids)
+
+    def exact_game_lookup(self, parsed, k=10, latest=False):
+        return exact_game_lookup(self.cx, parsed, k, latest)
+
+
 def extract_json_from_text(text):
     """Extract JSON object from LLM response"""
     # Try to find JSON object in the response
@@ -99,7 +140,7 @@ Instructions:
 
 Answer:"""
 
-    response = ollama_generate(LLM_MODEL, prompt)
+    response = ollama_generate(LLM_MODEL, prompt, priority=BATCH)
 
     # Parse response based on expected return format
     result = {}
@@ -136,12 +177,7 @@ Answer:"""
 def answer_player_question(question, player_rows, question_data):
     """Answer questions about players using detailed stats"""
     if not player_rows:
-        result = {}
-        for key in question_data["return"]:
-            if key == "evidence":
-                continue
-            result[key] = 0 if question_data["return"][key] == "int" else ""
-        return result
+        return empty_result(question_data)
 
     # Build context with top players
     ctx_lines = []
@@ -166,7 +202,7 @@ Instructions:
 
 Answer:"""
 
-    response = ollama_generate(LLM_MODEL, prompt)
+    response = ollama_generate(LLM_MODEL, prompt, priority=BATCH)
 
     # Parse response
     result = {}
@@ -223,62 +259,156 @@ Answer:"""
     return result
 
 
+def empty_result(question_data):
+    """Blank answer in the question's return format"""
+    return {
+        key: 0 if kind == "int" else ""
+        for key, kind in question_data["return"].items()
+        if key != "evidence"
+    }
+
+
+def answer_question(store, q):
+    # Questions that name a date and/or teams get a keyed lookup instead of vector search
+    matchup = parse_question(q["question"], store.teams)
+    game_rows = store.exact_game_lookup(matchup, k=10) if matchup.exact else []
+    if game_rows:
+        print(f"  Exact lookup: {len(game_rows)} games on {matchup.date_from} for teams {matchup.team_ids}")
+    else:
+        # Embed the question
+        qvec = embed(q["question"])
+
+        # Retrieve relevant games (more games for better coverage)
+        game_rows = store.retrieve_games(qvec, k=10)
+    game_ids = [r["game_id"] for r in game_rows]
+
+    # Determine if we need player stats
+    needs_player_data = "player_name" in q["return"]
+
+    if needs_player_data:
+        # Retrieve player stats
+        player_rows = store.retrieve_player_stats(game_ids)
+
+        # Generate answer using player context
+        result = answer_player_question(q["question"], player_rows, q)
+
+        # Set evidence to top player IDs
+        if player_rows:
+            evidence = [
+                {"table": "player_box_scores", "id": int(r["player_id"])}
+                for r in player_rows[:5]
+            ]
+        else:
+            evidence = [{"table": "player_box_scores", "id": 0}]
+    else:
+        # Generate answer using game context
+        result = answer_game_question(q["question"], game_rows, q)
+
+        # Set evidence to top game IDs
+        evidence = [
+            {"table": "game_details", "id": int(r["game_id"])}
+            for r in game_rows[:5]
+        ]
+
+    result["evidence"] = evidence
+    return result
+
+
+def answer_questions(store, questions):
+    answers = []
+    for q in questions:
+        print(f"\nProcessing question {q['id']}: {q['question']}")
+        for attempt in range(GEN_BATCH_RETRIES + 1):
+            try:
+                result = answer_question(store, q)
+                break
+            except (Overloaded, ModelUnavailable) as e:
+                # Chat traffic or a model outage; one question shouldn't sink the whole run
+                if attempt == GEN_BATCH_RETRIES:
+                    print(f"  ✗ Giving up on question {q['id']}: {e}")
+                    result = {**empty_result(q), "evidence": [], "error": str(e)}
+                    break
+                pause = getattr(e, "retry_after", BREAKER_RESET_SECONDS)
+                print(f"  Model busy or unavailable ({e}), retrying in {pause:.0f}s")
+                time.sleep(pause)
+
+        answers.append({
+            "id": q["id"],
+            "result": result
+        })
+
+        print(f"  ✓ Result: {result}")
+    return answers
+
+
+def same_games(a, b):
+    """Same games in the same order; for vector search, equal scores may come back in either order"""
+    if [r["game_id"] for r in a] == [r["game_id"] for r in b]:
+        return True
+    return bool(a) and "score" in a[0] and len(a) == len(b) and all(
+        abs(x["score"] - y["score"]) < 1e-4 for x, y in zip(a, b)
+    )
+
+
+def compare_stores(db, offline, questions):
+    """Check that both stores retrieve the same games and stats for each question; returns the mismatches"""
+    mismatches = []
+    for q in questions:
+        matchup = parse_question(q["question"], db.teams)
+        if matchup.exact:
+            db_games, offline_games = db.exact_game_lookup(matchup, k=10), offline.exact_game_lookup(matchup, k=10)
+        else:
+            qvec = embed(q["question"])
+            db_games, offline_games = db.retrieve_games(qvec, k=10), offline.retrieve_games(qvec, k=10)
+        game_ids = [int(r["game_id"]) for r in db_games]
+        if not same_games(db_games, offline_games):
+            offline_ids = [int(r["game_id"]) for r in offline_games]
+            mismatches.append(f"question {q['id']}: games {game_ids} (db) vs {offline_ids} (offline)")
+            continue
+        # Compared by value, since players tied on points/rebounds/assists can come back in either order
+        db_stats = [(r["points"], r["rebounds"], r["assists"]) for r in db.retrieve_player_stats(game_ids)]
+        offline_stats = [(r["points"], r["rebounds"], r["assists"]) for r in offline.retrieve_player_stats(game_ids)]
+        if db_stats != offline_stats:
+            mismatches.append(f"question {q['id']}: player stats differ for games {game_ids}")
+    return mismatches
+
+
 def main():
+    ap = argparse.ArgumentParser(description="Answer part1/questions.json")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--offline", nargs="?", const=EVAL_SNAPSHOT_DIR, metavar="DIR",
+        help="retrieve from an eval_snapshot export instead of Postgres",
+    )
+    mode.add_argument(
+        "--compare", nargs="?", const=EVAL_SNAPSHOT_DIR, metavar="DIR",
+        help="check the export retrieves the same as Postgres for every question, without answering",
+    )
+    args = ap.parse_args()
+
     print("Starting RAG Pipeline with Improved Extraction")
-    eng = sa.create_engine(DB_DSN)
 
     with open(QUESTIONS_PATH, encoding="utf-8") as f:
         questions = json.load(f)
 
-    answers = []
-
-    with eng.begin() as cx:
-        for q in questions:
-            print(f"\nProcessing question {q['id']}: {q['question']}")
-
-            # Embed the question
-            qvec = ollama_embed(EMBED_MODEL, q["question"])
-
-            # Retrieve relevant games (more games for better coverage)
-            game_rows = retrieve_games(cx, qvec, k=10)
-            game_ids = [r["game_id"] for r in game_rows]
-
-            # Determine if we need player stats
-            needs_player_data = "player_name" in q["return"]
-
-            if needs_player_data:
-                # Retrieve player stats
-                player_rows = retrieve_player_stats(cx, game_ids)
-
-                # Generate answer using player context
-                result = answer_player_question(q["question"], player_rows, q)
-
-                # Set evidence to top player IDs
-                if player_rows:
-                    evidence = [
-                        {"table": "player_box_scores", "id": int(r["player_id"])}
-                        for r in player_rows[:5]
-                    ]
-                else:
-                    evidence = [{"table": "player_box_scores", "id": 0}]
-            else:
-                # Generate answer using game context
-                result = answer_game_question(q["question"], game_rows, q)
-
-                # Set evidence to top game IDs
-                evidence = [
-                    {"table": "game_details", "id": int(r["game_id"])}
-                    for r in game_rows[:5]
-                ]
-
-            result["evidence"] = evidence
-
-            answers.append({
-                "id": q["id"],
-                "result": result
-            })
-
-            print(f"  ✓ Result: {result}")
+    warm_up_embedder()
+
+    if args.compare:
+        eng = sa.create_engine(DB_DSN)
+        with eng.begin() as cx:
+            mismatches = compare_stores(DbStore(cx), OfflineStore(args.compare), questions)
+        for m in mismatches:
+            print(f"  ✗ {m}")
+        print(f"{len(questions) - len(mismatches)}/{len(questions)} questions retrieve the same online and offline")
+        raise SystemExit(1 if mismatches else 0)
+
+    if args.offline:
+        print(f"Offline mode: reading {args.offline}")
+        answers = answer_questions(OfflineStore(args.offline), questions)
+    else:
+        eng = sa.create_engine(DB_DSN)
+        with eng.begin() as cx:
+            answers = answer_questions(DbStore(cx), questions)
 
     # Write answers to file
     with open(ANSWERS_PATH, "w", encoding="utf-8") as f:
@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class ModelUnavailable(Exception):
+    """Raised when the model server can't serve a call (breaker open, timeout, connection error)"""
+
+
+class LatencyTracker:
+    """Rolling window of recent latencies (seconds) with quantile lookups"""
+
+    def __init__(self, window=500, min_samples=20):
+        self._samples = deque(maxlen=window)
+        self._min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q):
+        with self._lock:
+            if len(self._samples) < self._min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Deadline:
+    """End-to-end time budget for one request; each step's timeout is capped by what's left"""
+
+    def __init__(self, seconds):
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    def timeout(self, limit):
+        """min(limit, remaining), raising ModelUnavailable once the budget is spent"""
+        left = self.remaining()
+        if left <= 0:
+            raise ModelUnavailable("request time budget exhausted")
+        return min(limit, left)
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets a single probe through once the cooldown passes"""
+
+    def __init__(self, name, failure_threshold, reset_seconds):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if self._probing else "open"
+
+    def check(self):
+        """Fail fast while open, without claiming the half-open probe"""
+        with self._lock:
+            if self._opened_at is not None and (
+                self._probing or time.monotonic() - self._opened_at < self.reset_seconds
+            ):
+                raise ModelUnavailable(f"{self.name} circuit open")
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._probing or time.monotonic() - self._opened_at < self.reset_seconds:
+                raise ModelUnavailable(f"{self.name} circuit open")
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_inconclusive(self):
+        """The call ended for the caller's own reasons (its time budget), which says nothing about the server"""
+        with self._lock:
+            # Hand a claimed probe back so the next call can make it
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    print(f"Circuit breaker {self.name} opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+
+def hedged(call, delay):
+    """Run call(); if it hasn't finished after `delay` seconds, race a second copy and take the first success"""
+    if delay is None:
+        return call()
+    first = _hedge_pool.submit(call)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+    pending = {first, _hedge_pool.submit(call)}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            if fut.exception() is None:
+                return fut.result()
+            error = fut.exception()
+    raise error
+
+
+def retry_with_jitter(call, retries, backoff, retry_on, deadline=None):
+    """Retry call() on `retry_on` errors with full-jitter exponential backoff, within an optional Deadline"""
+    for attempt in range(retries + 1):
+        try:
+            return call()
+        except retry_on:
+            if attempt == retries:
+                raise
+            pause = random.uniform(0, backoff * (2 ** attempt))
+            if deadline is not None and pause >= deadline.remaining():
+                raise
+            time.sleep(pause)
@@ -0,0 +1,203 @@
+import fcntl
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from backend.config import (
+    GEN_MAX_CONCURRENCY,
+    GEN_QUEUE_SIZE,
+    GEN_INTERACTIVE_DEADLINE,
+    GEN_BATCH_DEADLINE,
+    GEN_SLOT_DIR,
+    GEN_INTERACTIVE_RESERVED,
+)
+
+# Priority classes, lower runs first
+INTERACTIVE = 0
+BATCH = 1
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+DEFAULT_DEADLINES = {INTERACTIVE: GEN_INTERACTIVE_DEADLINE, BATCH: GEN_BATCH_DEADLINE}
+
+# Slots freed by other processes aren't signalled, so the head waiter re-checks this often
+SLOT_POLL_SECONDS = 0.05
+
+
+class Overloaded(Exception):
+    """Raised when a generation request can't be admitted"""
+
+    def __init__(self, reason, retry_after=1):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class SlotPool:
+    """Generation slots shared by every process using the same directory, one flock'd file per slot.
+
+    The kernel drops a dead process's locks, so a crashed rag.py run can't leak slots.
+    """
+
+    def __init__(self, directory, size, reserved):
+        os.makedirs(directory, exist_ok=True)
+        self.size = size
+        # Batch work must still be able to run when the cap is a single slot
+        self.reserved = max(0, min(reserved, size - 1))
+        self._paths = [os.path.join(directory, f"slot-{i}.lock") for i in range(size)]
+        self._waiting_path = os.path.join(directory, "interactive-waiting.lock")
+
+    def try_acquire(self, priority):
+        """Lock a free slot without blocking; returns the open slot file, or None"""
+        if priority != INTERACTIVE and self.interactive_waiting():
+            return None
+        # Interactive requests fill the reserved slots first, leaving the rest to batch jobs
+        first = 0 if priority == INTERACTIVE else self.reserved
+        for path in self._paths[first:]:
+            f = open(path, "a")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return f
+            except BlockingIOError:
+                f.close()
+        return None
+
+    def release(self, slot):
+        fcntl.flock(slot, fcntl.LOCK_UN)
+        slot.close()
+
+    def mark_waiting(self):
+        """Shared lock held while an interactive request waits, so batch waiters in every process hold back"""
+        f = open(self._waiting_path, "a")
+        fcntl.flock(f, fcntl.LOCK_SH)
+        return f
+
+    def interactive_waiting(self):
+        with open(self._waiting_path, "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(f, fcntl.LOCK_UN)
+        return False
+
+
+class GenerationScheduler:
+    """Caps concurrent LLM generations across processes and queues the rest by priority, then arrival order"""
+
+    def __init__(self, max_concurrency=GEN_MAX_CONCURRENCY, max_queue=GEN_QUEUE_SIZE,
+                 slot_dir=GEN_SLOT_DIR, interactive_reserved=GEN_INTERACTIVE_RESERVED):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._pool = SlotPool(slot_dir, max_concurrency, interactive_reserved)
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (priority, seq)
+        self._evicted = set()
+        self._seq = itertools.count()
+        self._active = 0
+        self._stats = {
+            p: {"admitted": 0, "rejected": 0, "preempted": 0, "timed_out": 0, "wait_sum": 0.0, "wait_max": 0.0}
+            for p in PRIORITY_NAMES
+        }
+
+    def acquire(self, priority=INTERACTIVE, deadline=None):
+        """Block until a slot is free and return it; raise Overloaded if the queue is full or the deadline passes"""
+        timeout = DEFAULT_DEADLINES[priority] if deadline is None else deadline
+        start = time.monotonic()
+        with self._cond:
+            if not self._waiting:
+                slot = self._pool.try_acquire(priority)
+                if slot is not None:
+                    self._admit(priority, 0.0)
+                    return slot
+            if len(self._waiting) >= self.max_queue and not self._evict_for(priority):
+                self._stats[priority]["rejected"] += 1
+                raise Overloaded("generation queue is full")
+
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiting, entry)
+            marker = self._pool.mark_waiting() if priority == INTERACTIVE else None
+            try:
+                expires = start + timeout
+                while True:
+                    if entry in self._evicted:
+                        self._evicted.discard(entry)
+                        self._stats[priority]["preempted"] += 1
+                        raise Overloaded("preempted by a higher-priority request")
+                    if self._waiting[0] == entry:
+                        slot = self._pool.try_acquire(priority)
+                        if slot is not None:
+                            break
+                    remaining = expires - time.monotonic()
+                    if remaining <= 0:
+                        self._waiting.remove(entry)
+                        heapq.heapify(self._waiting)
+                        self._stats[priority]["timed_out"] += 1
+                        self._cond.notify_all()
+                        raise Overloaded(f"waited {timeout:.0f}s for a generation slot")
+                    self._cond.wait(min(remaining, SLOT_POLL_SECONDS))
+            finally:
+                if marker is not None:
+                    self._pool.release(marker)
+            heapq.heappop(self._waiting)
+            self._admit(priority, time.monotonic() - start)
+            # The next waiter may also fit if more than one slot is free
+            self._cond.notify_all()
+            return slot
+
+    def _evict_for(self, priority):
+        """Make room for a higher-priority request by dropping the lowest-priority, newest waiter"""
+        victim = max(self._waiting)
+        if victim[0] <= priority:
+            return False
+        self._waiting.remove(victim)
+        heapq.heapify(self._waiting)
+        self._evicted.add(victim)
+        self._cond.notify_all()
+        return True
+
+    def _admit(self, priority, waited):
+        self._active += 1
+        s = self._stats[priority]
+        s["admitted"] += 1
+        s["wait_sum"] += waited
+        s["wait_max"] = max(s["wait_max"], waited)
+
+    def release(self, slot):
+        with self._cond:
+            self._pool.release(slot)
+            self._active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=INTERACTIVE, deadline=None):
+        slot = self.acquire(priority, deadline)
+        try:
+            yield
+        finally:
+            self.release(slot)
+
+    def metrics(self):
+        """Prometheus text exposition of queue depth, in-flight count and wait times for this process"""
+        with self._cond:
+            depth = {p: 0 for p in PRIORITY_NAMES}
+            for p, _ in self._waiting:
+                depth[p] += 1
+            lines = [
+                "# TYPE llm_generation_in_flight gauge",
+                f"llm_generation_in_flight {self._active}",
+                "# TYPE llm_generation_concurrency_limit gauge",
+                f"llm_generation_concurrency_limit {self.max_concurrency}",
+                "# TYPE llm_generation_queue_depth gauge",
+            ]
+            lines += [f'llm_generation_queue_depth{{priority="{PRIORITY_NAMES[p]}"}} {d}' for p, d in depth.items()]
+            for key, kind in [("admitted", "counter"), ("rejected", "counter"), ("preempted", "counter"),
+                              ("timed_out", "counter"), ("wait_sum", "counter"), ("wait_max", "gauge")]:
+                name = f"llm_generation_queue_{key}" + ("_seconds" if key.startswith("wait") else "_total")
+                lines.append(f"# TYPE {name} {kind}")
+                lines += [f'{name}{{priority="{PRIORITY_NAMES[p]}"}} {s[key]}' for p, s in self._stats.items()]
+        return "\n".join(lines) + "\n"
+
+
+scheduler = GenerationScheduler()
@@ -0,0 +1,31 @@
+import os
+import uvicorn
+import sqlalchemy as sa
+from backend import snapshot
+from backend.config import DB_DSN, WEB_WORKERS
+
+# Multi-worker serving: build the shared reference snapshot once, then start the workers,
+# which all memory-map it instead of repeating the startup work per process.
+# Generation slots are shared through GEN_SLOT_DIR; breaker state, the answer cache and
+# /api/metrics are per worker.
+#   python -m backend.serve
+
+
+def main():
+    eng = sa.create_engine(DB_DSN)
+    with eng.begin() as cx:
+        snapshot.publish(cx)
+    eng.dispose()
+    # Split the cores between workers' in-process embedding models instead of each claiming all of them
+    os.environ.setdefault("EMBED_THREADS", str(max(1, (os.cpu_count() or 1) // WEB_WORKERS)))
+    print(f"Starting {WEB_WORKERS} uvicorn workers")
+    uvicorn.run(
+        "backend.server:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=WEB_WORKERS,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,21 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 import sqlalchemy as sa
-from backend.config import DB_DSN, EMBED_MODEL, LLM_MODEL
-from backend.utils import ollama_embed, ollama_generate
+from backend.config import CHAT_TIME_BUDGET, DB_DSN, HNSW_EF_SEARCH, LLM_MODEL, MAX_SESSIONS, SESSION_MAX_TOKENS
+from backend import snapshot
+from backend.scheduler import Overloaded, scheduler
+from backend.query_parser import current_season, exact_game_lookup, parse_question, season_range
+from backend.resilience import Deadline, LatencyTracker, ModelUnavailable
+from backend.utils import breaker, embed, ollama_generate_full, prompt_eval_latency, warm_up_embedder
 from sqlalchemy import text
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
 
 app = FastAPI()
 app.add_middleware(
@@ -15,32 +26,207 @@ app.add_middleware(
     allow_headers=["*"],
 )
 eng = sa.create_engine(DB_DSN)
+chat_latency = LatencyTracker(window=1000)
+
+# Recent model answers, served back when the model server is down
+ANSWER_CACHE_SIZE = 256
+answer_cache = OrderedDict()
+answer_cache_lock = threading.Lock()
+
+@app.on_event("startup")
+def load_embedder():
+    # Keep the in-process embedding model resident so the first question isn't slow
+    warm_up_embedder()
+
+
+def clear_answer_cache(snap):
+    # Cached answers may be stale once new games or roster changes land
+    with answer_cache_lock:
+        answer_cache.clear()
+
+
+snapshot.on_new_generation(clear_answer_cache)
+
+
+@app.on_event("startup")
+def create_session_table():
+    # Model context tokens returned by the last turn of each chat session. Kept in Postgres rather
+    # than process memory so a follow-up continues the session whichever worker it lands on.
+    with eng.begin() as cx:
+        # Workers start together; serialise the CREATEs
+        cx.execute(text("SELECT pg_advisory_xact_lock(hashtext('chat_sessions'))"))
+        cx.execute(text(
+            "CREATE TABLE IF NOT EXISTS chat_sessions ("
+            "session_id TEXT PRIMARY KEY, context INTEGER[] NOT NULL, updated_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+        ))
+        cx.execute(text("CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated ON chat_sessions (updated_at)"))
+        # What the session's questions retrieved on, so a question about something else starts over
+        cx.execute(text("ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS scope TEXT NOT NULL DEFAULT ''"))
+
+
+@app.on_event("startup")
+def attach_snapshot():
+    # Workers share one memory-mapped copy of the reference data instead of each loading their own
+    snapshot.ensure(eng)
+
+
+@app.exception_handler(Overloaded)
+def overloaded(request: Request, exc: Overloaded):
+    # Fail fast rather than letting every chat user's latency balloon together
+    print(f"Rejected question: {exc.reason}")
+    return JSONResponse(
+        status_code=503,
+        content={"error": "overloaded", "detail": f"The assistant is busy ({exc.reason}), please try again shortly."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.middleware("http")
+async def track_chat_latency(request: Request, call_next):
+    start = time.monotonic()
+    response = await call_next(request)
+    if request.url.path == "/api/chat":
+        chat_latency.record(time.monotonic() - start)
+    return response
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def metrics():
+    lines = ["# TYPE chat_latency_seconds summary"]
+    for q in (0.5, 0.95, 0.99):
+        v = chat_latency.quantile(q)
+        if v is not None:
+            lines.append(f'chat_latency_seconds{{quantile="{q}"}} {v}')
+    lines.append("# TYPE llm_prompt_eval_seconds summary")
+    for q in (0.5, 0.95):
+        v = prompt_eval_latency.quantile(q)
+        if v is not None:
+            lines.append(f'llm_prompt_eval_seconds{{quantile="{q}"}} {v}')
+    lines.append("# TYPE model_circuit_open gauge")
+    lines.append(f"model_circuit_open {0 if breaker.state == 'closed' else 1}")
+    return scheduler.metrics() + "\n".join(lines) + "\n"
+
+
+def cache_key(question, scope):
+    # The scope pins what the answer was built from: a follow-up's topic, or a relative date's actual days
+    return scope + "|" + " ".join(question.lower().split())
+
+
+def remember_answer(question, scope, resp):
+    key = cache_key(question, scope)
+    with answer_cache_lock:
+        answer_cache[key] = resp
+        answer_cache.move_to_end(key)
+        while len(answer_cache) > ANSWER_CACHE_SIZE:
+            answer_cache.popitem(last=False)
+
+
+def fallback_answer(question, scope, ctx):
+    """Answer without the LLM: a cached answer if we have one, otherwise the raw SQL results"""
+    with answer_cache_lock:
+        cached = answer_cache.get(cache_key(question, scope))
+    if cached:
+        return cached
+    return "The language model is unavailable right now, so here is the matching data from the database:\n" + ctx
+
+
+@lru_cache(maxsize=4)
+def system_prefix(current_season_year):
+    """Fixed instructions that open every prompt; only changes when the season rolls over"""
+    last_season_year = current_season_year - 1
+    return (
+        "You are an NBA stats assistant. Answer each question based only on the context given with it.\n\n"
+        f"Current NBA season: {current_season_year}-{current_season_year+1} "
+        f"(games from August {current_season_year} to July {current_season_year+1}). "
+        f"Last season: {last_season_year}-{last_season_year+1} "
+        f"(games from August {last_season_year} to July {last_season_year+1}).\n"
+        f"Date references: 'last year' = the {last_season_year}-{(last_season_year+1) % 100:02d} season, "
+        f"'this year' = the {current_season_year}-{(current_season_year+1) % 100:02d} season, "
+        "'Christmas' = December 25.\n\n"
+    )
+
+
+def question_scope(matchup, player_filter):
+    """The teams, dates and player a question retrieves on; empty for one that names none, like a follow-up"""
+    parts = []
+    if matchup.team_ids:
+        parts.append("teams=" + ",".join(str(t) for t in sorted(matchup.team_ids)))
+    if matchup.date_from is not None:
+        parts.append(f"dates={matchup.date_from}..{matchup.date_to}")
+    if player_filter:
+        parts.append(f"player={player_filter}")
+    return ";".join(parts)
+
+
+def get_session(session_id):
+    """(context tokens, scope) of a session, or (None, "") if it's unknown or expired"""
+    with eng.begin() as cx:
+        row = cx.execute(
+            text("SELECT context, scope FROM chat_sessions WHERE session_id = :id"), {"id": session_id}
+        ).first()
+    return (row.context, row.scope) if row else (None, "")
+
+
+def save_session_context(session_id, context, scope):
+    with eng.begin() as cx:
+        if not context or len(context) > SESSION_MAX_TOKENS:
+            # Too long to keep extending without truncation, so the next turn starts fresh from the prefix
+            cx.execute(text("DELETE FROM chat_sessions WHERE session_id = :id"), {"id": session_id})
+            return
+        cx.execute(
+            text(
+                "INSERT INTO chat_sessions (session_id, context, scope) VALUES (:id, :context, :scope) "
+                "ON CONFLICT (session_id) DO UPDATE SET context = EXCLUDED.context, scope = EXCLUDED.scope, "
+                "updated_at = now()"
+            ),
+            {"id": session_id, "context": list(context), "scope": scope},
+        )
+        # Keep only the MAX_SESSIONS most recently used
+        cx.execute(
+            text(
+                "DELETE FROM chat_sessions WHERE updated_at <= "
+                "(SELECT updated_at FROM chat_sessions ORDER BY updated_at DESC OFFSET :n LIMIT 1)"
+            ),
+            {"n": MAX_SESSIONS},
+        )
+
+
+def embed_question(question, deadline):
+    try:
+        return embed(question, deadline=deadline)
+    except ModelUnavailable as e:
+        # Without an embedding we can still answer from filters and recency ordering
+        print(f"Embedding unavailable, skipping vector search: {e}")
+        return None
 
 
 class Q(BaseModel):
     question: str
+    # Returned by the previous answer; lets follow-ups continue from the model's cached context
+    session_id: Optional[str] = None
 
 
 @app.post("/api/chat")
 def answer(q: Q):
     print('Received question')
-    qvec = ollama_embed(EMBED_MODEL, q.question)
+    # Bounds the time spent waiting on the model server; past it we answer from the cache or raw SQL
+    deadline = Deadline(CHAT_TIME_BUDGET)
 
     # Add current date context for temporal awareness
-    from datetime import datetime
+    from datetime import date, datetime, timedelta
     import re as regex_module
     current_date = datetime.now()
-    current_calendar_year = current_date.year
 
-    # NBA seasons span two calendar years (e.g., 2024-25 season)
-    # "This year" = current season = 2025-26 season = games in 2025
-    # "Last year" = previous season = 2024-25 season = games in 2024
-    current_season_year = current_calendar_year  # 2025
-    last_season_year = current_calendar_year - 1  # 2024
+    # NBA seasons span two calendar years and, as in the query parser, run August to July,
+    # named by their first year: in March 2026 "this year" is the 2025-26 season (2025)
+    current_season_year = current_season(current_date.date())
+    last_season_year = current_season_year - 1
 
     # Detect temporal references in the question
     q_lower_temporal = q.question.lower()
     year_filter = None
+    year_range = None  # ISO day bounds for the SQL filters
+    year_label = None
     date_filter = None
     championship_query = False
     average_query = False
@@ -62,107 +248,85 @@ def answer(q: Q):
         print("Detected most recent game query")
 
     if 'last year' in q_lower_temporal:
-        year_filter = last_season_year  # 2024 for 2024-25 season
-        print(f"Detected 'last year' (season {year_filter}-{year_filter+1}): filtering to {year_filter}")
+        year_filter = last_season_year
     elif 'this year' in q_lower_temporal:
-        year_filter = current_season_year  # 2025 for 2025-26 season
-        print(f"Detected 'this year' (season {year_filter}-{year_filter+1}): filtering to {year_filter}")
+        year_filter = current_season_year
     elif 'christmas' in q_lower_temporal:
         # For Christmas questions, look for games on 12-25
         date_filter = '12-25'  # Month-day format
         print(f"Detected Christmas date filter: {date_filter}")
 
+    if year_filter:
+        year_from, year_to = season_range(year_filter)
+        year_label = f"the {year_filter}-{(year_filter+1) % 100:02d} season"
+        print(f"Detected season reference: filtering to {year_label} ({year_from} to {year_to})")
+
     # Check for any 4-digit year in the question (2020-2029)
     if not year_filter:
         import re
         year_match = re.search(r'\b(202[0-9])\b', q.question)
         if year_match:
             year_filter = int(year_match.group(1))
+            year_from, year_to = date(year_filter, 1, 1), date(year_filter + 1, 1, 1)
+            year_label = f"calendar year {year_filter}"
             print(f"Detected year filter: {year_filter}")
 
-    # Check if question mentions a specific player
+    if year_filter:
+        year_range = {"year_from": year_from.isoformat(), "year_to": year_to.isoformat()}
+
+    # Check if question mentions a specific player, using the shared reference snapshot
     player_filter = None
-    with eng.begin() as cx:
-        # Common NBA nicknames and abbreviations
-        nickname_map = {
-            'sga': 'Shai Gilgeous-Alexander',
-            'wemby': 'Victor Wembanyama',
-            'wembanyama': 'Victor Wembanyama',
-            'luka': 'Luka Dončić',
-            'doncic': 'Luka Dončić',
-            'lebron': 'LeBron James',
-            'giannis': 'Giannis Antetokounmpo',
-            'jokic': 'Nikola Jokić',
-            'embiid': 'Joel Embiid',
-            'steph': 'Stephen Curry',
-            'curry': 'Stephen Curry',
-            'kd': 'Kevin Durant',
-            'durant': 'Kevin Durant',
-            'ad': 'Anthony Davis',
-            'dame': 'Damian Lillard',
-            'lillard': 'Damian Lillard',
-            'kawhi': 'Kawhi Leonard',
-            'pg': 'Paul George',
-            'cp3': 'Chris Paul',
-            'book': 'Devin Booker',
-            'booker': 'Devin Booker',
-            'tatum': 'Jayson Tatum',
-            'ant': 'Anthony Edwards',
-            'ja': 'Ja Morant',
-            'morant': 'Ja Morant',
-            'harden': 'James Harden',
-            'kyrie': 'Kyrie Irving',
-            'irving': 'Kyrie Irving',
-        }
-
-        # Try to find player names mentioned in the question
-        all_players = cx.execute(
-            text("SELECT player_id, first_name, last_name FROM players")
-        ).mappings().all()
-
-        q_lower = q.question.lower()
-
-        # First check for nicknames (with word boundaries)
-        import re
-        for nickname, full_name in nickname_map.items():
-            # Use word boundaries to avoid false matches
-            if re.search(r'\b' + re.escape(nickname) + r'\b', q_lower):
-                # Find the player by their full name
-                for player in all_players:
-                    player_full = f"{player['first_name']} {player['last_name']}"
-                    if full_name.lower() == player_full.lower():
-                        player_filter = player['player_id']
-                        print(f"Detected player via nickname '{nickname}': {player['first_name']} {player['last_name']} (ID: {player_filter})")
-                        break
-                if player_filter:
-                    break
-
-        # If no nickname match, check for regular names (with word boundaries)
-        if not player_filter:
-            for player in all_players:
-                full_name = f"{player['first_name']} {player['last_name']}".lower()
-                last_name = player['last_name'].lower()
-                first_name = player['first_name'].lower()
-
-                # Use word boundaries to avoid matching substrings
-                # Only match first name if it's at least 4 characters (avoid common words like "ja", "chris")
-                if (re.search(r'\b' + re.escape(full_name) + r'\b', q_lower) or
-                    re.search(r'\b' + re.escape(last_name) + r'\b', q_lower) or
-                    (len(first_name) >= 4 and re.search(r'\b' + re.escape(first_name) + r'\b', q_lower))):
-                    player_filter = player['player_id']
-                    print(f"Detected player: {player['first_name']} {player['last_name']} (ID: {player_filter})")
-                    break
+    snap = snapshot.current()
+    q_lower = q.question.lower()
+
+    # First check for nicknames (with word boundaries)
+    import re
+    for nickname, player_id in snap.nicknames.items():
+        # Use word boundaries to avoid false matches
+        if re.search(r'\b' + re.escape(nickname) + r'\b', q_lower):
+            player_filter = player_id
+            print(f"Detected player via nickname '{nickname}' (ID: {player_filter})")
+            break
+
+    # If no nickname match, check for regular names (with word boundaries)
+    if not player_filter:
+        for player_id, first, last, full_name in zip(
+            snap["players_id"], snap["players_first"], snap["players_last"], snap["players_full_lower"]
+        ):
+            last_name = last.lower()
+            first_name = first.lower()
+
+            # Use word boundaries to avoid matching substrings
+            # Only match first name if it's at least 4 characters (avoid common words like "ja", "chris")
+            if (re.search(r'\b' + re.escape(full_name) + r'\b', q_lower) or
+                re.search(r'\b' + re.escape(last_name) + r'\b', q_lower) or
+                (len(first_name) >= 4 and re.search(r'\b' + re.escape(first_name) + r'\b', q_lower))):
+                player_filter = int(player_id)
+                print(f"Detected player: {first} {last} (ID: {player_filter})")
+                break
+
+    # Explicit dates, holidays, relative ranges, seasons and team pairs
+    matchup = parse_question(q.question, snap.teams, today=current_date.date())
 
     # Retrieve relevant games
     with eng.begin() as cx:
+        exact_rows = []
+        lookup_k = 10
+        # A team's last game is the newest game in its range, however wide the range is
+        lookup_latest = most_recent_game or not matchup.narrow
+        if (matchup.exact or (most_recent_game and matchup.team_ids)) and not championship_query:
+            # Keyed lookup on (team, game day) instead of vector search
+            exact_rows = exact_game_lookup(cx, matchup, k=lookup_k, latest=lookup_latest)
+            print(f"Exact lookup ({matchup.source} {matchup.date_from} to {matchup.date_to}, teams {matchup.team_ids}): {len(exact_rows)} games")
+
         # Special handling for championship queries
         if championship_query:
             # We only have regular season data, not playoff/finals data
             # Find the team with the best regular season record
-            year_clause = "WHERE EXTRACT(YEAR FROM g.game_timestamp::timestamp) = :year" if year_filter else ""
+            year_clause = "WHERE LEFT(g.game_timestamp, 10) >= :year_from AND LEFT(g.game_timestamp, 10) < :year_to" if year_filter else ""
             params = {"k": 5}
             if year_filter:
-                params["year"] = year_filter
+                params.update(year_range)
 
             # Get team with best record (most wins)
             best_team = cx.execute(
@@ -209,9 +373,11 @@ def answer(q: Q):
             else:
                 champion_row = None
                 game_rows = []
+        elif exact_rows:
+            game_rows = list(reversed(exact_rows)) if most_recent_game else exact_rows
         # If a player is detected, get games they played in instead of vector search
         elif player_filter:
-            year_clause = "AND EXTRACT(YEAR FROM g.game_timestamp::timestamp) = :year" if year_filter else ""
+            year_clause = "AND LEFT(g.game_timestamp, 10) >= :year_from AND LEFT(g.game_timestamp, 10) < :year_to" if year_filter else ""
             # If asking for most recent/last game, show only 1-3 games in DESC order
             if most_recent_game:
                 params = {"player_id": player_filter, "k": 3}
@@ -221,7 +387,7 @@ def answer(q: Q):
                 order_direction = "ASC"
 
             if year_filter:
-                params["year"] = year_filter
+                params.update(year_range)
 
             game_rows = cx.execute(
                 text(
@@ -245,7 +411,7 @@ def answer(q: Q):
             # For non-player queries, add year or date filter if detected
             where_clauses = []
             if year_filter:
-                where_clauses.append("EXTRACT(YEAR FROM g.game_timestamp::timestamp) = :year")
+                where_clauses.append("LEFT(g.game_timestamp, 10) >= :year_from AND LEFT(g.game_timestamp, 10) < :year_to")
             if date_filter:
                 where_clauses.append("TO_CHAR(g.game_timestamp::timestamp, 'MM-DD') = :date")
 
@@ -255,7 +421,7 @@ def answer(q: Q):
             if most_recent_game:
                 params = {"k": 3}
                 if year_filter:
-                    params["year"] = year_filter
+                    params.update(year_range)
                 if date_filter:
                     params["date"] = date_filter
 
@@ -276,9 +442,15 @@ def answer(q: Q):
                     params,
                 ).mappings().all()
             else:
-                params = {"q": str(qvec), "k": 5}
+                qvec = embed_question(q.question, deadline)
+                params = {"k": 5}
+                if qvec is not None:
+                    params["q"] = str(qvec)
+                    # Cosine distance, which the vector_cosine_ops HNSW index serves; it only holds embedded rows
+                    where_clause = "WHERE " + " AND ".join(where_clauses + ["g.embedding IS NOT NULL"])
+                    cx.execute(text(f"SET LOCAL hnsw.ef_search = {HNSW_EF_SEARCH}"))
                 if year_filter:
-                    params["year"] = year_filter
+                    params.update(year_range)
                 if date_filter:
                     params["date"] = date_filter
 
@@ -294,7 +466,8 @@ def answer(q: Q):
                         "JOIN teams ht ON g.home_team_id = ht.team_id "
                         "JOIN teams at ON g.away_team_id = at.team_id "
                         f"{where_clause} "
-                        "ORDER BY g.embedding <-> CAST(:q AS vector) LIMIT :k"
+                        + ("ORDER BY g.embedding <=> CAST(:q AS vector) LIMIT :k" if qvec is not None
+                           else "ORDER BY g.game_timestamp DESC LIMIT :k")
                     ),
                     params,
                 ).mappings().all()
@@ -309,10 +482,10 @@ def answer(q: Q):
             if player_filter:
                 # If this is an average query, calculate season averages
                 if average_query:
-                    year_clause_avg = "AND EXTRACT(YEAR FROM g.game_timestamp::timestamp) = :year" if year_filter else ""
+                    year_clause_avg = "AND LEFT(g.game_timestamp, 10) >= :year_from AND LEFT(g.game_timestamp, 10) < :year_to" if year_filter else ""
                     avg_params = {"player_id": player_filter}
                     if year_filter:
-                        avg_params["year"] = year_filter
+                        avg_params.update(year_range)
 
                     season_averages = cx.execute(
                         text(
@@ -389,7 +562,7 @@ def answer(q: Q):
     # Add season averages if this is an average query for a player
     if average_query and season_averages:
         ctx_parts.append(f"=== SEASON AVERAGES ===")
-        season_label = f"{year_filter}-{(year_filter+1) % 100:02d} season" if year_filter else "the season"
+        season_label = year_label or "the season"
         ctx_parts.append(f"{season_averages['player_name']} averaged {season_averages['avg_points']} points, {season_averages['avg_rebounds']} rebounds, and {season_averages['avg_assists']} assists per game over {season_averages['games_played']} games in {season_label}.")
         ctx_parts.append("")
 
@@ -397,7 +570,7 @@ def answer(q: Q):
     if championship_query and 'champion_row' in locals() and champion_row:
         ctx_parts.append(f"=== IMPORTANT: DATA LIMITATION ===")
         ctx_parts.append("The database only contains REGULAR SEASON games. Playoff and NBA Finals data is NOT available.")
-        season_label = f"{year_filter}-{(year_filter+1) % 100:02d}" if year_filter else "the season"
+        season_label = year_label or "the season"
         ctx_parts.append(f"Based on regular season data: The {champion_row['team_name']} had the best record in {season_label} with {champion_row['wins']} wins.")
         ctx_parts.append("Note: This does NOT indicate who won the NBA Championship/Finals, as playoff data is not included.")
         ctx_parts.append("")
@@ -409,8 +582,8 @@ def answer(q: Q):
             f"on {r['game_timestamp'][:10]}. Winner: {r['winner']}"
         )
 
-    # Only include player stats if a player was detected in the question
-    if player_filter and player_rows:
+    # Only include player stats if a player was detected or the question pinned down specific games
+    if (player_filter or exact_rows) and player_rows:
         ctx_parts.append("\n=== PLAYER STATS ===")
         for p in player_rows:
             ctx_parts.append(
@@ -420,16 +593,30 @@ def answer(q: Q):
 
     ctx = "\n".join(ctx_parts)
 
-    # Add helpful instruction with temporal context
-    temporal_context = f"Today's date: {current_date.strftime('%Y-%m-%d')}. Current NBA season: {current_season_year}-{current_season_year+1} (games in {current_season_year}). Last season: {last_season_year}-{last_season_year+1} (games in {last_season_year})."
-
     # Add specific filtering info if applied
     filter_info = ""
-    if date_filter:
+    if exact_rows:
+        if len(matchup.team_ids) >= 2:
+            teams_info = " between the teams asked about"
+        elif matchup.team_ids:
+            teams_info = " involving the team asked about"
+        else:
+            teams_info = ""
+        if matchup.date_from is None:
+            filter_info = f" (showing only the most recent games{teams_info}"
+        else:
+            last_day = matchup.date_to - timedelta(days=1)
+            span = matchup.date_from.isoformat() if last_day == matchup.date_from else f"{matchup.date_from} to {last_day}"
+            filter_info = f" (showing only games on {span}{teams_info}"
+        if len(exact_rows) == lookup_k:
+            # Capped list: stop the model from counting or totalling it as if it were every game
+            which = "most recent" if lookup_latest else "earliest"
+            filter_info += f"; only the {which} {lookup_k} games are listed, not every game in the range, so don't count or total them"
+        filter_info += ")"
+    elif date_filter:
         filter_info = " (filtered to show only games on December 25)"
     elif year_filter:
-        season_label = f"{year_filter}-{(year_filter+1) % 100:02d}"  # e.g., "2024-25"
-        filter_info = f" (filtered to show only games from {season_label} season, calendar year {year_filter})"
+        filter_info = f" (filtered to show only games from {year_label})"
 
     # Update chronological ordering info based on query type
     if most_recent_game:
@@ -441,12 +628,37 @@ def answer(q: Q):
         if player_filter:
             chronological_info += " The first game/stats listed is the player's earliest game in the data."
 
-    instruction = f"{temporal_context}\n\nAnswer based only on the context above{filter_info}. {chronological_info}"
-
-    # Add date interpretation help
-    instruction += f"\n\nDate references: 'last year' = {last_season_year}-{(last_season_year+1) % 100:02d} season (games in {last_season_year}), 'this year' = {current_season_year}-{(current_season_year+1) % 100:02d} season (games in {current_season_year}), 'Christmas' = December 25."
-
-    resp = ollama_generate(LLM_MODEL, f"{instruction}\n\nContext:\n{ctx}\n\nQ:{q.question}\nA:")
+    # Everything that varies per question goes after the fixed system prefix so the model server can reuse its KV cache
+    turn = (
+        f"Today's date: {current_date.strftime('%Y-%m-%d')}.\n\n"
+        f"Context{filter_info}:\n{ctx}\n\n{chronological_info}\n\nQ:{q.question}\nA:"
+    )
+
+    session_id = q.session_id or uuid.uuid4().hex
+    session_context, session_scope = get_session(session_id) if q.session_id else (None, "")
+    scope = question_scope(matchup, player_filter)
+    if session_context and scope and scope != session_scope:
+        # A new matchup, date or player: earlier turns' games would only mislead the model
+        print(f"New topic for session ({session_scope!r} -> {scope!r}), starting a fresh model context")
+        session_context = None
+    elif session_context:
+        # A follow-up builds on the earlier topic, so its cached answer only holds within that topic,
+        # or within this session if the topic was never pinned down
+        scope = session_scope or f"session={session_id}"
+    timings = None
+    try:
+        if session_context:
+            # Follow-up: the prefix and earlier turns are already in the returned context
+            out = ollama_generate_full(LLM_MODEL, turn, context=session_context, deadline=deadline)
+        else:
+            out = ollama_generate_full(LLM_MODEL, system_prefix(current_season_year) + turn, deadline=deadline)
+        resp = out["response"]
+        timings = out["timings"]
+        save_session_context(session_id, out.get("context"), scope)
+        remember_answer(q.question, scope, resp)
+    except ModelUnavailable as e:
+        print(f"Generation unavailable, answering without the model: {e}")
+        resp = fallback_answer(q.question, scope, ctx)
 
     # Combine evidence from both games and players with detailed info
     evidence = []
@@ -482,4 +694,6 @@ def answer(q: Q):
     return {
             "answer": resp,
             "evidence": evidence,
+            "session_id": session_id,
+            "timings": timings,
         }
\ No newline at end of file
@@ -0,0 +1,199 @@
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+import numpy as np
+from sqlalchemy import text
+from backend.config import SNAPSHOT_DIR, SNAPSHOT_CHECK_SECONDS
+
+# Read-only reference data is written once into a generation directory of .npy files,
+# and every uvicorn worker memory-maps the same files so the pages are shared:
+#
+#   SNAPSHOT_DIR/CURRENT        name of the live generation, swapped atomically
+#   SNAPSHOT_DIR/gen-000007/    players_*.npy, teams_*.npy, nickname_*.npy, manifest.json
+#
+# ingest.py/embed.py publish a new generation when they finish and workers re-attach on their
+# next request, so no restart is needed.
+
+CURRENT_FILE = os.path.join(SNAPSHOT_DIR, "CURRENT")
+LOCK_FILE = os.path.join(SNAPSHOT_DIR, ".lock")
+KEEP_GENERATIONS = 3
+
+# Common NBA nicknames and abbreviations
+NICKNAMES = {
+    'sga': 'Shai Gilgeous-Alexander',
+    'wemby': 'Victor Wembanyama',
+    'wembanyama': 'Victor Wembanyama',
+    'luka': 'Luka Dončić',
+    'doncic': 'Luka Dončić',
+    'lebron': 'LeBron James',
+    'giannis': 'Giannis Antetokounmpo',
+    'jokic': 'Nikola Jokić',
+    'embiid': 'Joel Embiid',
+    'steph': 'Stephen Curry',
+    'curry': 'Stephen Curry',
+    'kd': 'Kevin Durant',
+    'durant': 'Kevin Durant',
+    'ad': 'Anthony Davis',
+    'dame': 'Damian Lillard',
+    'lillard': 'Damian Lillard',
+    'kawhi': 'Kawhi Leonard',
+    'pg': 'Paul George',
+    'cp3': 'Chris Paul',
+    'book': 'Devin Booker',
+    'booker': 'Devin Booker',
+    'tatum': 'Jayson Tatum',
+    'ant': 'Anthony Edwards',
+    'ja': 'Ja Morant',
+    'morant': 'Ja Morant',
+    'harden': 'James Harden',
+    'kyrie': 'Kyrie Irving',
+    'irving': 'Kyrie Irving',
+}
+
+
+def str_array(values):
+    # Fixed-width unicode so the array can be memory-mapped like any numeric one
+    return np.array([v or "" for v in values], dtype=str)
+
+
+def _read_current():
+    try:
+        with open(CURRENT_FILE, encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def build_arrays(cx):
+    """Query the reference tables into plain numpy arrays"""
+    players = cx.execute(text("SELECT player_id, first_name, last_name FROM players")).mappings().all()
+    teams = cx.execute(text("SELECT team_id, city, name, abbreviation FROM teams ORDER BY team_id")).mappings().all()
+
+    first = [p["first_name"] or "" for p in players]
+    last = [p["last_name"] or "" for p in players]
+    full_lower = [f"{f} {l}".lower() for f, l in zip(first, last)]
+    player_ids = np.array([int(p["player_id"]) for p in players], dtype=np.int64)
+
+    # Resolve nicknames to player ids once here instead of on every request
+    nick_keys, nick_ids = [], []
+    for nickname, full_name in NICKNAMES.items():
+        matches = [i for i, n in enumerate(full_lower) if n == full_name.lower()]
+        if matches:
+            nick_keys.append(nickname)
+            nick_ids.append(player_ids[matches[0]])
+
+    return {
+        "players_id": player_ids,
+        "players_first": str_array(first),
+        "players_last": str_array(last),
+        "players_full_lower": str_array(full_lower),
+        "teams_id": np.array([int(t["team_id"]) for t in teams], dtype=np.int64),
+        "teams_city": str_array(t["city"] for t in teams),
+        "teams_name": str_array(t["name"] for t in teams),
+        "teams_abbr": str_array(t["abbreviation"] for t in teams),
+        "nickname_keys": str_array(nick_keys),
+        "nickname_player_ids": np.array(nick_ids, dtype=np.int64),
+    }
+
+
+def publish(cx, if_missing=False):
+    """Write a new snapshot generation from the database and make it current"""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    arrays = build_arrays(cx)
+    with open(LOCK_FILE, "w") as lock:
+        # Serialise concurrent publishers (e.g. several workers starting with no snapshot)
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        current = _read_current()
+        if if_missing and current:
+            # Another process published while we were waiting on the lock
+            return int(current.split("-")[1])
+        generation = int(current.split("-")[1]) + 1 if current else 1
+        name = f"gen-{generation:06d}"
+        tmp = os.path.join(SNAPSHOT_DIR, f".{name}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for key, arr in arrays.items():
+            np.save(os.path.join(tmp, f"{key}.npy"), arr)
+        with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"generation": generation, "created": time.time(), "arrays": sorted(arrays)}, f)
+        os.rename(tmp, os.path.join(SNAPSHOT_DIR, name))
+
+        pointer = CURRENT_FILE + ".tmp"
+        with open(pointer, "w", encoding="utf-8") as f:
+            f.write(name)
+        os.replace(pointer, CURRENT_FILE)
+
+        # Workers still mapping an old generation keep their pages after unlink
+        old = sorted(d for d in os.listdir(SNAPSHOT_DIR) if d.startswith("gen-"))[:-KEEP_GENERATIONS]
+        for d in old:
+            shutil.rmtree(os.path.join(SNAPSHOT_DIR, d), ignore_errors=True)
+    print(f"Published reference snapshot {name}")
+    return generation
+
+
+class Snapshot:
+    """One attached generation; arrays are read-only memory maps"""
+
+    def __init__(self, name):
+        path = os.path.join(SNAPSHOT_DIR, name)
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.generation = manifest["generation"]
+        self.arrays = {
+            key: np.load(os.path.join(path, f"{key}.npy"), mmap_mode="r")
+            for key in manifest["arrays"]
+        }
+        self.nicknames = dict(zip(self.arrays["nickname_keys"].tolist(), self.arrays["nickname_player_ids"].tolist()))
+        self.teams = list(zip(
+            self.arrays["teams_id"].tolist(), self.arrays["teams_city"].tolist(),
+            self.arrays["teams_name"].tolist(), self.arrays["teams_abbr"].tolist(),
+        ))
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def __contains__(self, key):
+        return key in self.arrays
+
+
+_attached = None
+_attached_name = None
+_last_check = 0.0
+_attach_lock = threading.Lock()
+_listeners = []
+
+
+def on_new_generation(callback):
+    """Register callback(snapshot) to run when this process attaches a new generation"""
+    _listeners.append(callback)
+
+
+def current():
+    """The live snapshot, re-attached if ingest/embed published a newer generation"""
+    global _attached, _attached_name, _last_check
+    now = time.monotonic()
+    if _attached is not None and now - _last_check < SNAPSHOT_CHECK_SECONDS:
+        return _attached
+    with _attach_lock:
+        _last_check = now
+        name = _read_current()
+        if name is None:
+            return _attached
+        if name != _attached_name:
+            _attached = Snapshot(name)
+            _attached_name = name
+            print(f"Attached reference snapshot {name} (pid {os.getpid()})")
+            for callback in _listeners:
+                callback(_attached)
+    return _attached
+
+
+def ensure(eng):
+    """Attach to the current snapshot, publishing one first if none exists yet"""
+    if current() is None:
+        with eng.begin() as cx:
+            publish(cx, if_missing=True)
+    return current()
@@ -0,0 +1,435 @@
+import argparse
+import csv
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import sqlalchemy as sa
+from sqlalchemy import text
+from backend import snapshot
+from backend.config import (
+    DB_DSN,
+    EMBED_BATCH_SIZE,
+    GAME_TIMEZONE,
+    INCOMING_DIR,
+    STREAM_POLL_SECONDS,
+    STREAM_BATCH_ROWS,
+    STREAM_MAX_DELAY_SECONDS,
+)
+from backend.embed import row_text
+from backend.resilience import ModelUnavailable
+from backend.utils import embed_batch
+
+# Incremental ingestion of new games and box scores without a full reload:
+#   python -m backend.stream_ingest --watch            # poll INCOMING_DIR for *.csv / *.ndjson files
+#   producer | python -m backend.stream_ingest --stdin  # NDJSON records on stdin
+#
+# CSV files are routed by filename prefix (e.g. game_details_2025-04-14.csv). NDJSON records
+# carry their table: {"table": "game_details", "row": {...}}. Write files elsewhere and rename
+# them into the drop directory so half-written files are never picked up.
+
+# Column types mirror the CSVs ingest.py loads; keys back the ON CONFLICT upserts
+SCHEMAS = {
+    "teams": {
+        "key": ["team_id"],
+        "required": ["team_id", "city", "name", "abbreviation"],
+        "columns": {"team_id": "int", "city": "str", "name": "str", "abbreviation": "str",
+                    "conference": "str", "division": "str"},
+    },
+    "players": {
+        "key": ["player_id"],
+        "required": ["player_id", "team_id", "first_name", "last_name"],
+        "columns": {"player_id": "int", "team_id": "int", "first_name": "str", "last_name": "str",
+                    "birth_date": "str", "height": "int", "weight": "float", "position": "str",
+                    "draft_year": "int", "season_exp": "float"},
+    },
+    "game_details": {
+        "key": ["game_id"],
+        "required": ["game_id", "season", "game_timestamp", "home_team_id", "away_team_id", "home_points", "away_points"],
+        "columns": {"game_id": "int", "season": "int", "game_timestamp": "timestamp", "home_team_id": "int",
+                    "away_team_id": "int", "home_points": "int", "away_points": "int", "winning_team_id": "int"},
+    },
+    "player_box_scores": {
+        "key": ["game_id", "person_id"],
+        "required": ["game_id", "person_id", "team_id", "points", "offensive_reb", "defensive_reb", "assists"],
+        "columns": {"game_id": "int", "person_id": "int", "team_id": "int", "starter": "bool", "seconds": "float",
+                    "points": "int", "fg2_made": "int", "fg2_attempted": "int", "fg3_made": "int",
+                    "fg3_attempted": "int", "ft_attempted": "int", "ft_made": "int", "offensive_reb": "int",
+                    "defensive_reb": "int", "assists": "int", "steals": "int", "blocks": "int", "turnovers": "int",
+                    "defensive_fouls": "int", "offensive_fouls": "int"},
+    },
+}
+# Parents first so a file containing a new game and its box scores validates in one batch
+TABLE_ORDER = ["teams", "players", "game_details", "player_box_scores"]
+# game_details fields row_text embeds; a change to any of them invalidates the stored embedding
+EMBED_FIELDS = ["season", "game_timestamp", "home_team_id", "away_team_id", "home_points", "away_points"]
+GAME_TZ = ZoneInfo(GAME_TIMEZONE)
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+class PostIngestError(Exception):
+    """The batch's rows are committed, but embedding them or publishing the snapshot failed"""
+
+
+def coerce(value, kind):
+    if value is None or (isinstance(value, str) and value.strip() == ""):
+        return None
+    try:
+        if kind == "int":
+            f = float(value)
+            if not f.is_integer():
+                raise ValueError
+            return int(f)
+        if kind == "float":
+            return float(value)
+        if kind == "bool":
+            if isinstance(value, bool):
+                return value
+            v = str(value).strip().lower()
+            if v in ("true", "t", "1", "yes"):
+                return True
+            if v in ("false", "f", "0", "no"):
+                return False
+            raise ValueError
+        if kind == "timestamp":
+            # Same text format as the bulk CSVs so LEFT(game_timestamp, 10) stays the game day
+            ts = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+            if ts.tzinfo is not None:
+                # A 02:00Z tip-off is the previous evening's game locally
+                ts = ts.astimezone(GAME_TZ)
+            return ts.replace(tzinfo=None).strftime("%Y-%m-%d %H:%M:%S.%f")
+        return str(value).strip()
+    except (TypeError, ValueError):
+        raise InvalidRecord(f"bad {kind} value {value!r}")
+
+
+def validate(table, raw):
+    """Coerce a raw record to the table's column types, raising InvalidRecord on bad data"""
+    schema = SCHEMAS.get(table)
+    if schema is None:
+        raise InvalidRecord(f"unknown table {table!r}")
+    row = {}
+    for col, kind in schema["columns"].items():
+        try:
+            row[col] = coerce(raw.get(col), kind)
+        except InvalidRecord as e:
+            raise InvalidRecord(f"{col}: {e}")
+    missing = [c for c in schema["required"] if row[c] is None]
+    if missing:
+        raise InvalidRecord(f"missing {', '.join(missing)}")
+
+    if table == "game_details":
+        if row["home_team_id"] == row["away_team_id"]:
+            raise InvalidRecord("home and away team are the same")
+        if row["home_points"] < 0 or row["away_points"] < 0:
+            raise InvalidRecord("negative score")
+        winner = row["home_team_id"] if row["home_points"] > row["away_points"] else row["away_team_id"]
+        if row["winning_team_id"] is None:
+            row["winning_team_id"] = winner
+        elif row["winning_team_id"] != winner:
+            raise InvalidRecord("winning_team_id doesn't match the score")
+    return row
+
+
+class Batch:
+    """Validated rows per table, keyed so a later record for the same key replaces an earlier one"""
+
+    def __init__(self):
+        self.rows = {t: {} for t in TABLE_ORDER}
+        self.rejected = []
+
+    def add(self, table, raw):
+        try:
+            row = validate(table, raw)
+        except InvalidRecord as e:
+            self.rejected.append({"table": table, "row": raw, "error": str(e)})
+            return
+        self.rows[table][tuple(row[k] for k in SCHEMAS[table]["key"])] = row
+
+    def __len__(self):
+        return sum(len(r) for r in self.rows.values())
+
+    def reject_all(self, error):
+        """Move every pending row to rejected, e.g. when the batch couldn't be written"""
+        for table in TABLE_ORDER:
+            self.rejected += [{"table": table, "row": row, "error": error} for row in self.rows[table].values()]
+            self.rows[table] = {}
+
+
+def has_embedding_column(cx):
+    return cx.execute(text(
+        "SELECT 1 FROM information_schema.columns WHERE table_name = 'game_details' AND column_name = 'embedding'"
+    )).first() is not None
+
+
+def ensure_upsert_keys(cx):
+    """Unique indexes the ON CONFLICT upserts need; ingest.py's table replace drops them"""
+    for table, schema in SCHEMAS.items():
+        cx.execute(text(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{table}_key ON {table} ({', '.join(schema['key'])})"
+        ))
+
+
+def check_references(cx, batch):
+    """Drop rows pointing at teams/games that exist neither in the DB nor in this batch"""
+    team_ids = set(cx.execute(text("SELECT team_id FROM teams")).scalars()) | {k[0] for k in batch.rows["teams"]}
+    for key, row in list(batch.rows["game_details"].items()):
+        if row["home_team_id"] not in team_ids or row["away_team_id"] not in team_ids:
+            batch.rejected.append({"table": "game_details", "row": row, "error": "unknown team"})
+            del batch.rows["game_details"][key]
+
+    box = batch.rows["player_box_scores"]
+    if not box:
+        return
+    game_ids = list({k[0] for k in box})
+    games = {
+        r.game_id: (r.home_team_id, r.away_team_id)
+        for r in cx.execute(
+            text("SELECT game_id, home_team_id, away_team_id FROM game_details WHERE game_id = ANY(:ids)"),
+            {"ids": game_ids},
+        )
+    }
+    games.update({k[0]: (r["home_team_id"], r["away_team_id"]) for k, r in batch.rows["game_details"].items()})
+    for key, row in list(box.items()):
+        teams = games.get(row["game_id"])
+        if teams is None or row["team_id"] not in teams:
+            error = "unknown game" if teams is None else "team didn't play in this game"
+            batch.rejected.append({"table": "player_box_scores", "row": row, "error": error})
+            del box[key]
+
+
+def upsert(cx, table, rows, reset_embedding=False):
+    cols = list(SCHEMAS[table]["columns"])
+    keys = SCHEMAS[table]["key"]
+    updates = [f"{c} = EXCLUDED.{c}" for c in cols if c not in keys]
+    if reset_embedding:
+        # Only rows whose embedded fields changed get re-embedded, so re-dropping a file is a no-op
+        old = ", ".join(f"{table}.{c}" for c in EMBED_FIELDS)
+        new = ", ".join(f"EXCLUDED.{c}" for c in EMBED_FIELDS)
+        updates.append(f"embedding = CASE WHEN ({old}) IS DISTINCT FROM ({new}) THEN NULL ELSE {table}.embedding END")
+    cx.execute(
+        text(
+            f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(':' + c for c in cols)}) "
+            f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {', '.join(updates)}"
+        ),
+        rows,
+    )
+
+
+def embed_pending(eng):
+    """Embed game rows with no embedding yet: new or changed games, plus any backlog from earlier failures"""
+    with eng.begin() as cx:
+        if not has_embedding_column(cx):
+            return 0
+        rows = cx.execute(text(
+            f"SELECT game_id, {', '.join(EMBED_FIELDS)} "
+            "FROM game_details WHERE embedding IS NULL ORDER BY game_timestamp DESC"
+        )).all()
+    done = 0
+    for start in range(0, len(rows), EMBED_BATCH_SIZE):
+        chunk = rows[start:start + EMBED_BATCH_SIZE]
+        try:
+            vecs = embed_batch([row_text(r) for r in chunk])
+        except ModelUnavailable as e:
+            print(f"Embedding unavailable, {len(rows) - done} games left for the next pass: {e}")
+            break
+        with eng.begin() as cx:
+            cx.execute(
+                text("UPDATE game_details SET embedding = :v WHERE game_id = :gid"),
+                [{"v": v, "gid": int(r.game_id)} for v, r in zip(vecs, chunk)],
+            )
+        done += len(chunk)
+    return done
+
+
+def apply(eng, batch):
+    """Upsert one batch in a single transaction, then embed new games and publish a fresh snapshot.
+
+    Raises PostIngestError if the upsert committed but a later step failed, so callers can tell
+    "nothing landed" from "landed, but not embedded or published yet".
+    """
+    if len(batch) == 0:
+        return
+    start = time.monotonic()
+    with eng.begin() as cx:
+        ensure_upsert_keys(cx)
+        check_references(cx, batch)
+        reset_embedding = has_embedding_column(cx)
+        counts = {}
+        for table in TABLE_ORDER:
+            rows = list(batch.rows[table].values())
+            if rows:
+                upsert(cx, table, rows, reset_embedding=reset_embedding and table == "game_details")
+                counts[table] = len(rows)
+    embedded, errors = 0, []
+    if counts.get("game_details"):
+        try:
+            embedded = embed_pending(eng)
+        except Exception as e:
+            # Rows left without an embedding are picked up by the next batch's embed pass
+            errors.append(f"embedding failed: {e}")
+
+    # Workers re-attach to the new snapshot on their next request and drop answers cached from older data
+    try:
+        with eng.begin() as cx:
+            snapshot.publish(cx)
+    except Exception as e:
+        errors.append(f"publishing the snapshot failed: {e}")
+    print(f"Upserted {counts}, embedded {embedded} games in {time.monotonic() - start:.2f}s")
+    if errors:
+        raise PostIngestError(f"upserted {counts}, but {'; '.join(errors)}")
+
+
+def table_for_file(name):
+    for table in sorted(SCHEMAS, key=len, reverse=True):
+        if name.startswith(table):
+            return table
+    return None
+
+
+def read_file(path, batch):
+    name = os.path.basename(path)
+    if name.endswith(".csv"):
+        table = table_for_file(name)
+        with open(path, newline="", encoding="utf-8") as f:
+            for raw in csv.DictReader(f):
+                batch.add(table, raw)
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                add_ndjson(line, batch, default_table=table_for_file(name))
+
+
+def add_ndjson(line, batch, default_table=None):
+    line = line.strip()
+    if not line:
+        return
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError as e:
+        batch.rejected.append({"table": None, "row": line, "error": f"bad json: {e}"})
+        return
+    table = record.get("table", default_table)
+    batch.add(table, record.get("row", {k: v for k, v in record.items() if k != "table"}))
+
+
+def write_rejected(batch, target):
+    if not batch.rejected:
+        return
+    with open(target, "a", encoding="utf-8") as f:
+        for r in batch.rejected:
+            f.write(json.dumps(r, default=str) + "\n")
+    print(f"Rejected {len(batch.rejected)} records, see {target}")
+
+
+def watch(eng, directory):
+    processed = os.path.join(directory, "processed")
+    rejected = os.path.join(directory, "rejected")
+    os.makedirs(processed, exist_ok=True)
+    os.makedirs(rejected, exist_ok=True)
+    print(f"Watching {directory} for new games and box scores")
+    while True:
+        names = sorted(
+            (n for n in os.listdir(directory) if n.endswith((".csv", ".ndjson", ".jsonl")) and not n.startswith(".")),
+            key=lambda n: os.path.getmtime(os.path.join(directory, n)),
+        )
+        for name in names:
+            path = os.path.join(directory, name)
+            batch = Batch()
+            try:
+                read_file(path, batch)
+                apply(eng, batch)
+            except PostIngestError as e:
+                # The rows are in the DB, so the file counts as processed; don't re-drop it
+                print(f"Ingested {name}, {e}")
+            except Exception as e:
+                # Nothing from the file was committed. Park it so it isn't retried forever, and keep watching
+                print(f"Failed to ingest {name}, nothing was written, moved to {rejected}: {e}")
+                shutil.move(path, os.path.join(rejected, name))
+                continue
+            write_rejected(batch, os.path.join(rejected, name + ".rejected.ndjson"))
+            shutil.move(path, os.path.join(processed, name))
+        time.sleep(STREAM_POLL_SECONDS)
+
+
+def read_stdin(eng, rejected_path):
+    """Apply NDJSON from stdin in batches, flushing when the stream goes quiet or the batch gets old or full.
+
+    Invalid records and batches that failed to write go to `rejected_path`, which can be replayed with --stdin.
+    """
+    os.makedirs(os.path.dirname(rejected_path) or ".", exist_ok=True)
+    lines = queue.Queue()
+
+    def reader():
+        for line in sys.stdin:
+            lines.put(line)
+        lines.put(None)
+
+    threading.Thread(target=reader, daemon=True).start()
+    batch = Batch()
+    opened = None  # when the pending batch got its first record
+    done = False
+    while not done:
+        # Quiet period is STREAM_POLL_SECONDS with no input; a trickling producer is capped by the max delay
+        timeout = STREAM_POLL_SECONDS
+        if opened is not None:
+            timeout = max(0.0, min(timeout, opened + STREAM_MAX_DELAY_SECONDS - time.monotonic()))
+        quiet = False
+        try:
+            line = lines.get(timeout=timeout)
+            if line is None:
+                done = True
+            else:
+                add_ndjson(line, batch)
+        except queue.Empty:
+            quiet = True
+        if opened is None and (len(batch) or batch.rejected):
+            opened = time.monotonic()
+        if opened is None:
+            continue
+        if done or quiet or len(batch) >= STREAM_BATCH_ROWS or time.monotonic() - opened >= STREAM_MAX_DELAY_SECONDS:
+            try:
+                apply(eng, batch)
+            except PostIngestError as e:
+                print(f"Ingested batch, {e}", file=sys.stderr)
+            except Exception as e:
+                print(f"Failed to ingest {len(batch)} records, nothing was written: {e}", file=sys.stderr)
+                batch.reject_all(f"batch failed: {e}")
+            for r in batch.rejected:
+                print(f"Rejected {r['table']} record: {r['error']}", file=sys.stderr)
+            write_rejected(batch, rejected_path)
+            batch = Batch()
+            opened = None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Incrementally ingest new games and box scores")
+    mode = ap.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--watch", nargs="?", const=INCOMING_DIR, metavar="DIR", help="poll a drop directory")
+    mode.add_argument("--stdin", action="store_true", help="read NDJSON records from stdin")
+    ap.add_argument(
+        "--rejected", metavar="FILE", default=os.path.join(INCOMING_DIR, "rejected", "stdin.rejected.ndjson"),
+        help="where --stdin appends records it couldn't ingest",
+    )
+    args = ap.parse_args()
+
+    eng = sa.create_engine(DB_DSN)
+    with eng.begin() as cx:
+        ensure_upsert_keys(cx)
+    if args.stdin:
+        read_stdin(eng, args.rejected)
+    else:
+        os.makedirs(args.watch, exist_ok=True)
+        watch(eng, args.watch)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,187 @@
+import time
 import requests, json
-from backend.config import OLLAMA_HOST
+from requests.adapters import HTTPAdapter
+from backend.config import (
+    OLLAMA_HOST,
+    OLLAMA_KEEP_ALIVE,
+    EMBED_MODEL,
+    MODEL_CONNECT_TIMEOUT,
+    EMBED_READ_TIMEOUT,
+    GEN_READ_TIMEOUT,
+    EMBED_RETRIES,
+    EMBED_RETRY_BACKOFF,
+    EMBED_HEDGE,
+    BREAKER_FAILURES,
+    BREAKER_RESET_SECONDS,
+)
+from backend.resilience import CircuitBreaker, LatencyTracker, ModelUnavailable, hedged, retry_with_jitter
+from backend.scheduler import scheduler, DEFAULT_DEADLINES, INTERACTIVE
 
+LOCAL_EMBED_PREFIX = "hf:"
 
-def ollama_embed(model: str, text: str):
-    r = requests.post(f"{OLLAMA_HOST}/api/embeddings", json={"model": model, "prompt": text})
-    r.raise_for_status()
-    return r.json()["embedding"]
+# Pooled keep-alive connections to the model server, shared by all worker threads
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
+# One breaker per model server: if it's unhealthy both embeddings and generation are affected
+breaker = CircuitBreaker("ollama", BREAKER_FAILURES, BREAKER_RESET_SECONDS)
+embed_latency = LatencyTracker()
+generate_latency = LatencyTracker()
+prompt_eval_latency = LatencyTracker()
+
+
+class ServerError(requests.HTTPError):
+    """5xx from the model server, worth retrying for idempotent calls"""
+
+
+def _timeouts(read_timeout, deadline=None):
+    """(connect, read) timeouts for one model call, capped by the request's remaining budget"""
+    if deadline is None:
+        return MODEL_CONNECT_TIMEOUT, read_timeout
+    return deadline.timeout(MODEL_CONNECT_TIMEOUT), deadline.timeout(read_timeout)
+
+
+def _budget_capped(error, timeout, read_limit):
+    """Whether a timeout fired at the request's shortened budget rather than the call's own limit"""
+    if isinstance(error, requests.ConnectTimeout):
+        return timeout[0] < MODEL_CONNECT_TIMEOUT
+    return isinstance(error, requests.ReadTimeout) and timeout[1] < read_limit
 
 
-def ollama_generate(model: str, prompt: str):
-    r = requests.post(f"{OLLAMA_HOST}/api/generate", json={"model": model, "prompt": prompt, "stream": False})
+def _post(path, payload, timeout):
+    r = session.post(f"{OLLAMA_HOST}{path}", json=payload, timeout=timeout)
+    if r.status_code >= 500:
+        raise ServerError(f"{r.status_code} from {path}", response=r)
     r.raise_for_status()
-    return r.json()["response"]
+    return r.json()
+
+
+def _guarded(call, latency, capped=lambda e: False):
+    """Run a model call behind the circuit breaker, mapping transport failures to ModelUnavailable.
+
+    `capped(error)` says a timeout came from the request's own budget; a busy model that outlasts a
+    caller who queued for most of its budget isn't a failing one, so those don't count against it.
+    """
+    breaker.before_call()
+    start = time.monotonic()
+    try:
+        result = call()
+    except (requests.ConnectionError, requests.Timeout, ServerError) as e:
+        if capped(e):
+            breaker.record_inconclusive()
+            raise ModelUnavailable(f"request time budget exhausted: {e}") from e
+        breaker.record_failure()
+        raise ModelUnavailable(str(e)) from e
+    except ModelUnavailable:
+        # The request's budget ran out between retries
+        breaker.record_inconclusive()
+        raise
+    except Exception:
+        # The server answered (e.g. a 4xx), so it's healthy even though this call failed
+        breaker.record_success()
+        raise
+    breaker.record_success()
+    latency.record(time.monotonic() - start)
+    return result
+
+
+def ollama_embed(model: str, text: str, deadline=None):
+    last_timeout = [(MODEL_CONNECT_TIMEOUT, EMBED_READ_TIMEOUT)]
+
+    def attempt():
+        timeout = _timeouts(EMBED_READ_TIMEOUT, deadline)
+        last_timeout[0] = timeout
+        return _post(
+            "/api/embeddings",
+            {"model": model, "prompt": text, "keep_alive": OLLAMA_KEEP_ALIVE},
+            timeout,
+        )["embedding"]
+
+    # Embeddings are idempotent, so retry transient failures and optionally hedge slow ones
+    delay = embed_latency.quantile(0.95) if EMBED_HEDGE else None
+    return _guarded(
+        lambda: retry_with_jitter(
+            lambda: hedged(attempt, delay),
+            EMBED_RETRIES,
+            EMBED_RETRY_BACKOFF,
+            (requests.ConnectionError, requests.Timeout, ServerError),
+            deadline,
+        ),
+        embed_latency,
+        lambda e: _budget_capped(e, last_timeout[0], EMBED_READ_TIMEOUT),
+    )
+
+
+def ollama_generate_full(model: str, prompt: str, priority: int = INTERACTIVE, context=None, deadline=None):
+    """Generate and return Ollama's full reply, including `context` tokens and timings.
+
+    With a resilience.Deadline, the queue wait and read timeout are capped by the time left in it.
+    """
+    payload = {"model": model, "prompt": prompt, "stream": False, "keep_alive": OLLAMA_KEEP_ALIVE}
+    if context:
+        # Continue from the previous turn's KV state instead of resending the conversation
+        payload["context"] = context
+    # Don't queue behind calls to a server that's known to be down
+    breaker.check()
+    wait = DEFAULT_DEADLINES[priority]
+    if deadline is not None:
+        wait = deadline.timeout(wait)
+    # Admission control: raises scheduler.Overloaded instead of piling more work onto the model
+    with scheduler.slot(priority, wait):
+        timeout = _timeouts(GEN_READ_TIMEOUT, deadline)
+        # Not retried: a generation that timed out has already burned its share of the model
+        r = _guarded(
+            lambda: _post("/api/generate", payload, timeout),
+            generate_latency,
+            lambda e: _budget_capped(e, timeout, GEN_READ_TIMEOUT),
+        )
+
+    # Ollama reports durations in nanoseconds
+    r["timings"] = {
+        "prompt_tokens": r.get("prompt_eval_count", 0),
+        "prompt_eval_ms": r.get("prompt_eval_duration", 0) / 1e6,
+        "load_ms": r.get("load_duration", 0) / 1e6,
+        "eval_tokens": r.get("eval_count", 0),
+        "eval_ms": r.get("eval_duration", 0) / 1e6,
+        "total_ms": r.get("total_duration", 0) / 1e6,
+    }
+    prompt_eval_latency.record(r["timings"]["prompt_eval_ms"] / 1000)
+    t = r["timings"]
+    print(
+        f"LLM call: prompt {t['prompt_tokens']} tok in {t['prompt_eval_ms']:.0f} ms, "
+        f"output {t['eval_tokens']} tok in {t['eval_ms']:.0f} ms, load {t['load_ms']:.0f} ms"
+    )
+    return r
+
+
+def ollama_generate(model: str, prompt: str, priority: int = INTERACTIVE):
+    return ollama_generate_full(model, prompt, priority)["response"]
+
+
+def is_local_embed(model: str = EMBED_MODEL):
+    return model.startswith(LOCAL_EMBED_PREFIX)
+
+
+def embed(text: str, model: str = EMBED_MODEL, deadline=None):
+    """Embed one text with the backend selected by EMBED_MODEL; `deadline` bounds the Ollama call"""
+    if is_local_embed(model):
+        # Imported lazily so the Ollama path never pays for loading torch
+        from backend.local_embed import get_embedder
+        return get_embedder(model).embed(text)
+    return ollama_embed(model, text, deadline)
+
+
+def embed_batch(texts, model: str = EMBED_MODEL):
+    """Embed a list of texts, batched when running in-process"""
+    if is_local_embed(model):
+        from backend.local_embed import get_embedder
+        return get_embedder(model).embed_batch(list(texts))
+    return [ollama_embed(model, t) for t in texts]
+
+
+def warm_up_embedder(model: str = EMBED_MODEL):
+    """Load and warm the in-process model up front; no-op for Ollama"""
+    if is_local_embed(model):
+        from backend.local_embed import get_embedder
+        get_embedder(model).warm_up()
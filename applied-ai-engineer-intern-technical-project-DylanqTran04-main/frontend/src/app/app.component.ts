@@ -26,6 +26,9 @@ export class AppComponent implements AfterViewChecked {
   messages: Message[] = [];
   userInput = '';
   isLoading = false;
+  // Lets follow-up questions reuse the model's context from earlier turns. The server starts the
+  // context over when a question names a different matchup, date or player; New chat drops it outright.
+  private sessionId?: string;
 
   suggestions = [
     'Who won Christmas Day 2023?',
@@ -36,7 +39,19 @@ export class AppComponent implements AfterViewChecked {
   private shouldScrollToBottom = false;
 
   constructor(private chatService: ChatService) {
-    // Add welcome message
+    this.addWelcome();
+  }
+
+  newChat(): void {
+    if (this.isLoading) {
+      return;
+    }
+    this.sessionId = undefined;
+    this.messages = [];
+    this.addWelcome();
+  }
+
+  private addWelcome(): void {
     this.messages.push({
       sender: 'bot',
       text: 'Welcome to the NBA Stats Assistant! Ask me about NBA games from the 2023-24 and 2024-25 seasons.',
@@ -64,10 +79,11 @@ export class AppComponent implements AfterViewChecked {
     this.shouldScrollToBottom = true;
 
     // Call the chat service
-    this.chatService.sendMessage(input).subscribe({
+    this.chatService.sendMessage(input, this.sessionId).subscribe({
       next: (res: any) => {
         const reply = res?.answer ?? 'No answer provided.';
         const evidence = res?.evidence ?? [];
+        this.sessionId = res?.session_id ?? this.sessionId;
 
         this.messages.push({
           sender: 'bot',
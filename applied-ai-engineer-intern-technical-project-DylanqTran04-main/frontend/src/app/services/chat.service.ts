@@ -13,8 +13,8 @@ export class ChatService extends BaseService {
     super(http);
   }
 
-  sendMessage(question: string): Observable<any> {
+  sendMessage(question: string, sessionId?: string): Observable<any> {
     const endpoint = `${this.baseUrl}/chat`;
-    return this.post(endpoint, { question });
+    return this.post(endpoint, { question, session_id: sessionId });
   }
 }
\ No newline at end of file
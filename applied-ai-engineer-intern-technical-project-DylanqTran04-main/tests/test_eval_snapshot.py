@@ -0,0 +1,84 @@
+import json
+from datetime import date, timedelta
+import numpy as np
+import pytest
+from backend import rag
+from backend.config import EMBED_MODEL
+from backend.eval_snapshot import OfflineStore
+from backend.query_parser import ParsedQuery, season_range
+
+GSW, SAC = 10, 20
+
+
+@pytest.fixture
+def store(tmp_path):
+    """An export of 30 GSW vs SAC games, one every three days from the start of the 2025-26 season"""
+    n = 30
+    days = [date(2025, 10, 1) + timedelta(days=3 * i) for i in range(n)]
+    arrays = {
+        "game_id": np.arange(1, n + 1, dtype=np.int64),
+        "game_timestamp": np.array([f"{d} 19:30:00.000000" for d in days]),
+        "game_day": np.array([int(d.strftime("%Y%m%d")) for d in days], dtype=np.int32),
+        "home_team_id": np.full(n, GSW, dtype=np.int64),
+        "home_team": np.array(["Golden State Warriors"] * n),
+        "away_team_id": np.full(n, SAC, dtype=np.int64),
+        "away_team": np.array(["Sacramento Kings"] * n),
+        "home_points": np.full(n, 110, dtype=np.int64),
+        "away_points": np.full(n, 100, dtype=np.int64),
+        "embedding": np.eye(n, 4, dtype=np.float32) + 0.1,
+        "has_embedding": np.arange(n) % 2 == 0,
+        "team_id": np.array([GSW, SAC], dtype=np.int64),
+        "team_city": np.array(["Golden State", "Sacramento"]),
+        "team_name": np.array(["Warriors", "Kings"]),
+        "team_abbr": np.array(["GSW", "SAC"]),
+    }
+    for key, arr in arrays.items():
+        np.save(tmp_path / f"{key}.npy", arr)
+    (tmp_path / "manifest.json").write_text(json.dumps({"embed_model": EMBED_MODEL, "arrays": sorted(arrays)}))
+    return OfflineStore(str(tmp_path))
+
+
+def test_team_season_lookup_returns_the_latest_games(store):
+    # "Warriors last game this season": the newest game must be in the list, not the 10th of the season
+    d0, d1 = season_range(2025)
+    rows = store.exact_game_lookup(ParsedQuery(d0, d1, [GSW]), k=10)
+    assert [r["game_id"] for r in rows] == list(range(21, 31))
+
+
+def test_narrow_lookup_returns_the_first_games(store):
+    rows = store.exact_game_lookup(ParsedQuery(date(2025, 10, 1), date(2025, 11, 1), [GSW]), k=3)
+    assert [r["game_id"] for r in rows] == [1, 2, 3]
+    rows = store.exact_game_lookup(ParsedQuery(date(2025, 10, 1), date(2025, 11, 1), [GSW]), k=3, latest=True)
+    assert [r["game_id"] for r in rows] == [9, 10, 11]
+
+
+def test_retrieval_skips_games_without_embeddings(store):
+    rows = store.retrieve_games(np.array([0, 0, 1, 0], dtype=np.float32), k=5)
+    assert rows[0]["game_id"] == 3
+    assert all(r["game_id"] % 2 == 1 for r in rows)
+
+
+class Reversed:
+    """A store whose vector search disagrees with the export"""
+
+    def __init__(self, store):
+        self.store = store
+        self.teams = store.teams
+
+    def retrieve_games(self, qvec, k=10):
+        return list(reversed(self.store.retrieve_games(qvec, k)))
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+def test_compare_stores_reports_retrieval_differences(store, monkeypatch):
+    monkeypatch.setattr(rag, "embed", lambda text: [0.0, 0.0, 1.0, 0.0])
+    monkeypatch.setattr(OfflineStore, "retrieve_player_stats", lambda self, game_ids: [])
+    questions = [
+        {"id": 1, "question": "Warriors vs Kings", "return": {}},
+        {"id": 2, "question": "Best comeback ever?", "return": {}},
+    ]
+    assert rag.compare_stores(store, store, questions) == []
+    [mismatch] = rag.compare_stores(Reversed(store), store, questions)
+    assert mismatch.startswith("question 2: games")
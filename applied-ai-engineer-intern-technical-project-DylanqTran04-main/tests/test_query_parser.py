@@ -0,0 +1,140 @@
+import csv
+import json
+import os
+from datetime import date, timedelta
+import pytest
+from backend.query_parser import parse_question
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+TODAY = date(2026, 10, 18)
+
+with open(os.path.join(ROOT, "backend", "data", "teams.csv"), newline="", encoding="utf-8") as f:
+    TEAMS = [(int(r["team_id"]), r["city"], r["name"], r["abbreviation"]) for r in csv.DictReader(f)]
+BY_ABBR = {abbr: team_id for team_id, _, _, abbr in TEAMS}
+
+with open(os.path.join(ROOT, "part1", "questions.json"), encoding="utf-8") as f:
+    QUESTIONS = {q["id"]: q["question"] for q in json.load(f)}
+
+
+def parse(question):
+    return parse_question(question, TEAMS, today=TODAY)
+
+
+def teams(*abbrs):
+    return [BY_ABBR[a] for a in abbrs]
+
+
+@pytest.mark.parametrize("qid, day, abbrs", [
+    (1, date(2023, 10, 27), ["GSW", "SAC"]),
+    (2, date(2024, 12, 31), ["OKC", "MIN"]),
+    (3, date(2023, 12, 25), ["GSW", "DEN"]),
+    (4, date(2023, 12, 25), ["LAL", "BOS"]),
+    (5, date(2024, 1, 26), ["DAL", "ATL"]),
+    (6, date(2024, 12, 30), ["DEN", "UTA"]),
+    (7, date(2023, 1, 16), ["LAL", "HOU"]),
+    (8, date(2025, 2, 1), ["OKC", "SAC"]),
+    (9, date(2023, 10, 25), ["DAL"]),
+    # "4/9 in the 2023 NBA season" is April of the 2023-24 season
+    (10, date(2024, 4, 9), []),
+])
+def test_part1_questions(qid, day, abbrs):
+    p = parse(QUESTIONS[qid])
+    assert (p.date_from, (p.date_to - p.date_from).days) == (day, 1)
+    assert p.team_ids == teams(*abbrs)
+    assert p.exact
+
+
+@pytest.mark.parametrize("question, day", [
+    ("Christmas game", date(2025, 12, 25)),  # most recent occurrence
+    ("Who won on Thanksgiving 2023?", date(2023, 11, 23)),
+    ("MLK Day 2024 games", date(2024, 1, 15)),
+    ("Halloween game in the 2023-24 season", date(2023, 10, 31)),
+    ("New Year's Day 2024", date(2024, 1, 1)),
+])
+def test_holidays(question, day):
+    p = parse(question)
+    assert (p.source, p.date_from, p.date_to) == ("holiday", day, day + timedelta(days=1))
+
+
+@pytest.mark.parametrize("question, season", [
+    ("Knicks record in the 2023-24 season", 2023),
+    ("Knicks record in 2023-2024", 2023),
+    ("Celtics in the 2023 regular season", 2023),
+    ("Who scored the most last year?", 2025),
+    ("Lakers games this season", 2026),
+])
+def test_season_labels(question, season):
+    p = parse(question)
+    assert p.season == season
+    assert (p.date_from, p.date_to) == (date(season, 8, 1), date(season + 1, 8, 1))
+
+
+def test_season_without_teams_is_too_broad_for_lookup():
+    assert not parse("Who scored the most in the 2023-24 season?").exact
+
+
+@pytest.mark.parametrize("question, date_from, date_to", [
+    ("What happened yesterday?", date(2026, 10, 17), date(2026, 10, 18)),
+    ("Scores from last night", date(2026, 10, 17), date(2026, 10, 18)),
+    ("Games tonight", date(2026, 10, 18), date(2026, 10, 19)),
+    ("Top scorers in the last 7 days", date(2026, 10, 11), date(2026, 10, 19)),
+    ("Best games last week", date(2026, 10, 11), date(2026, 10, 19)),
+    ("Results last month", date(2026, 9, 1), date(2026, 10, 1)),
+])
+def test_relative_ranges(question, date_from, date_to):
+    p = parse(question)
+    assert (p.source, p.date_from, p.date_to) == ("relative", date_from, date_to)
+
+
+@pytest.mark.parametrize("question", [
+    "Who went on a 10-2 run vs the Heat?",
+    "How did the Celtics win that 4-1 series?",
+    "Celtics 110-98 win",
+])
+def test_scores_and_runs_are_not_dates(question):
+    p = parse(question)
+    assert p.date_from is None
+    assert not p.exact
+
+
+def test_dash_date_needs_a_year():
+    assert parse("Heat game on 1-26-24").date_from == date(2024, 1, 26)
+    assert parse("Heat game on 1-26").date_from is None
+
+
+def test_slash_date_without_year_is_most_recent():
+    assert parse("Heat game on 4/9").date_from == date(2026, 4, 9)
+
+
+def test_bare_team_pair_uses_lookup_without_dates():
+    p = parse("Thunder and Timberwolves")
+    assert p.team_ids == teams("OKC", "MIN")
+    assert p.date_from is None
+    assert p.exact
+
+
+@pytest.mark.parametrize("question, abbr, date_from", [
+    ("What was the Warriors' last game this season?", "GSW", date(2026, 8, 1)),
+    ("What was the Warriors' last game this year?", "GSW", date(2026, 8, 1)),
+    ("How did the Lakers do in 2024?", "LAL", date(2024, 1, 1)),
+])
+def test_one_team_over_a_wide_range_is_not_a_lookup(question, abbr, date_from):
+    # A lookup lists 10 games, too few to stand for a team's whole season or year
+    p = parse(question)
+    assert p.team_ids == teams(abbr)
+    assert p.date_from == date_from
+    assert not p.narrow
+    assert not p.exact
+
+
+def test_one_team_over_a_narrow_range_is_a_lookup():
+    p = parse("Warriors games last week")
+    assert p.team_ids == teams("GSW")
+    assert p.narrow and p.exact
+
+
+def test_team_aliases():
+    assert parse("Mavs vs Sixers").team_ids == teams("DAL", "PHI")
+    assert parse("LA Lakers at LA Clippers").team_ids == teams("LAL", "LAC")
+    # Abbreviations only count in capitals
+    assert parse("who will win the game").team_ids == []
@@ -0,0 +1,52 @@
+import pytest
+from backend import rag
+from backend.resilience import ModelUnavailable
+from backend.scheduler import Overloaded
+
+QUESTIONS = [
+    {"id": 1, "question": "Who won?", "return": {"winner": "string", "score": "string", "evidence": "list"}},
+    {"id": 2, "question": "How many points?", "return": {"points": "int", "evidence": "list"}},
+]
+GAME = {"game_id": 7, "game_timestamp": "2024-01-01 19:00:00", "home_team": "A", "away_team": "B",
+        "home_points": 100, "away_points": 90, "winner": "A"}
+
+
+class Store:
+    teams = [(1, "Atlanta", "Hawks", "ATL")]
+
+    def retrieve_games(self, qvec, k=10):
+        return [GAME]
+
+
+@pytest.fixture(autouse=True)
+def no_waiting(monkeypatch):
+    monkeypatch.setattr(rag, "embed", lambda text: [0.0])
+    monkeypatch.setattr(rag.time, "sleep", lambda s: None)
+
+
+def test_a_failing_question_doesnt_stop_the_run(monkeypatch):
+    def generate(model, prompt, priority):
+        if "Who won?" in prompt:
+            raise Overloaded("preempted by a higher-priority request")
+        return "They scored 100"
+    monkeypatch.setattr(rag, "ollama_generate", generate)
+
+    answers = rag.answer_questions(Store(), QUESTIONS)
+    assert answers[0]["result"] == {"winner": "", "score": "", "evidence": [],
+                                    "error": "preempted by a higher-priority request"}
+    assert answers[1]["result"] == {"points": 100, "evidence": [{"table": "game_details", "id": 7}]}
+
+
+def test_transient_failures_are_retried(monkeypatch):
+    calls = []
+
+    def generate(model, prompt, priority):
+        calls.append(prompt)
+        if len(calls) == 1:
+            raise ModelUnavailable("ollama circuit open")
+        return "They scored 100"
+    monkeypatch.setattr(rag, "ollama_generate", generate)
+
+    answers = rag.answer_questions(Store(), QUESTIONS[1:])
+    assert answers[0]["result"]["points"] == 100
+    assert len(calls) == 2
@@ -0,0 +1,45 @@
+import pytest
+import requests
+from backend import utils
+from backend.config import GEN_READ_TIMEOUT, MODEL_CONNECT_TIMEOUT
+from backend.resilience import CircuitBreaker, LatencyTracker, ModelUnavailable
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    b = CircuitBreaker("test", failure_threshold=2, reset_seconds=60)
+    monkeypatch.setattr(utils, "breaker", b)
+    return b
+
+
+def timing_out(timeout):
+    def call():
+        raise requests.ReadTimeout("read timed out")
+    return lambda: utils._guarded(call, LatencyTracker(), lambda e: utils._budget_capped(e, timeout, GEN_READ_TIMEOUT))
+
+
+def test_budget_capped_timeouts_leave_the_breaker_closed(breaker):
+    # A request that queued for most of its budget and then ran out isn't a model failure
+    for _ in range(5):
+        with pytest.raises(ModelUnavailable, match="budget"):
+            timing_out((MODEL_CONNECT_TIMEOUT, 3.0))()
+    assert breaker.state == "closed"
+
+
+def test_timeouts_at_the_call_limit_open_the_breaker(breaker):
+    for _ in range(2):
+        with pytest.raises(ModelUnavailable):
+            timing_out((MODEL_CONNECT_TIMEOUT, GEN_READ_TIMEOUT))()
+    assert breaker.state == "open"
+
+
+def test_budget_capped_probe_hands_the_probe_back(breaker):
+    breaker.reset_seconds = 0
+    breaker.record_failure()
+    breaker.record_failure()
+    with pytest.raises(ModelUnavailable):
+        timing_out((MODEL_CONNECT_TIMEOUT, 3.0))()
+    # Still open but not stuck half-open: the next call gets to probe
+    assert breaker.state == "open"
+    breaker.before_call()
+    assert breaker.state == "half_open"
@@ -0,0 +1,102 @@
+import threading
+import time
+import pytest
+from backend.scheduler import BATCH, INTERACTIVE, GenerationScheduler, Overloaded
+
+
+def start(fn):
+    t = threading.Thread(target=fn, daemon=True)
+    t.start()
+    return t
+
+
+def wait_until(cond, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < end, "condition not reached"
+        time.sleep(0.01)
+
+
+def waiter(sched, priority, events, name, hold=0.05):
+    def run():
+        try:
+            slot = sched.acquire(priority, deadline=5)
+        except Overloaded as e:
+            events.append((name, e.reason))
+            return
+        events.append((name, "admitted"))
+        time.sleep(hold)
+        sched.release(slot)
+    return run
+
+
+def test_interactive_preempts_newest_batch_waiter_when_queue_full(tmp_path):
+    sched = GenerationScheduler(max_concurrency=1, max_queue=2, slot_dir=str(tmp_path), interactive_reserved=0)
+    running = sched.acquire(BATCH)
+    events = []
+    threads = [start(waiter(sched, BATCH, events, "batch-1"))]
+    wait_until(lambda: len(sched._waiting) == 1)
+    threads.append(start(waiter(sched, BATCH, events, "batch-2")))
+    wait_until(lambda: len(sched._waiting) == 2)
+
+    threads.append(start(waiter(sched, INTERACTIVE, events, "chat")))
+    wait_until(lambda: ("batch-2", "preempted by a higher-priority request") in events)
+
+    sched.release(running)
+    for t in threads:
+        t.join(5)
+    assert events == [
+        ("batch-2", "preempted by a higher-priority request"),
+        ("chat", "admitted"),
+        ("batch-1", "admitted"),
+    ]
+
+
+def test_full_queue_still_rejects_equal_priority(tmp_path):
+    sched = GenerationScheduler(max_concurrency=1, max_queue=1, slot_dir=str(tmp_path), interactive_reserved=0)
+    running = sched.acquire(INTERACTIVE)
+    events = []
+    t = start(waiter(sched, INTERACTIVE, events, "queued"))
+    wait_until(lambda: len(sched._waiting) == 1)
+    with pytest.raises(Overloaded, match="queue is full"):
+        sched.acquire(INTERACTIVE)
+    sched.release(running)
+    t.join(5)
+    assert events == [("queued", "admitted")]
+
+
+def test_slots_are_shared_between_schedulers(tmp_path):
+    # Two schedulers on one directory stand in for the server and a rag.py process
+    server = GenerationScheduler(max_concurrency=1, max_queue=4, slot_dir=str(tmp_path))
+    rag = GenerationScheduler(max_concurrency=1, max_queue=4, slot_dir=str(tmp_path))
+    slot = rag.acquire(BATCH)
+    with pytest.raises(Overloaded, match="waited"):
+        server.acquire(INTERACTIVE, deadline=0.2)
+    rag.release(slot)
+    server.release(server.acquire(INTERACTIVE, deadline=0.2))
+
+
+def test_reserved_slot_is_only_for_interactive(tmp_path):
+    server = GenerationScheduler(max_concurrency=2, max_queue=4, slot_dir=str(tmp_path), interactive_reserved=1)
+    rag = GenerationScheduler(max_concurrency=2, max_queue=4, slot_dir=str(tmp_path), interactive_reserved=1)
+    batch_slot = rag.acquire(BATCH)
+    with pytest.raises(Overloaded):
+        rag.acquire(BATCH, deadline=0.2)
+    chat_slot = server.acquire(INTERACTIVE, deadline=0.2)
+    server.release(chat_slot)
+    rag.release(batch_slot)
+
+
+def test_batch_in_another_process_yields_to_waiting_interactive(tmp_path):
+    server = GenerationScheduler(max_concurrency=1, max_queue=4, slot_dir=str(tmp_path))
+    rag = GenerationScheduler(max_concurrency=1, max_queue=4, slot_dir=str(tmp_path))
+    running = server.acquire(INTERACTIVE)
+    events = []
+    threads = [start(waiter(rag, BATCH, events, "batch"))]
+    wait_until(lambda: len(rag._waiting) == 1)
+    threads.append(start(waiter(server, INTERACTIVE, events, "chat")))
+    wait_until(lambda: len(server._waiting) == 1)
+    server.release(running)
+    for t in threads:
+        t.join(5)
+    assert events == [("chat", "admitted"), ("batch", "admitted")]
@@ -0,0 +1,59 @@
+import io
+import json
+import sys
+import pytest
+from backend import stream_ingest
+from backend.stream_ingest import InvalidRecord, coerce, validate
+
+
+@pytest.mark.parametrize("value, stored", [
+    ("2025-04-13 15:30:00", "2025-04-13 15:30:00.000000"),
+    # Late games in UTC belong to the previous local day
+    ("2025-04-16T02:00:00Z", "2025-04-15 22:00:00.000000"),
+    ("2025-01-16T03:30:00+00:00", "2025-01-15 22:30:00.000000"),
+    ("2025-04-15T19:00:00-07:00", "2025-04-15 22:00:00.000000"),
+])
+def test_timestamps_are_stored_in_local_time(value, stored):
+    assert coerce(value, "timestamp") == stored
+
+
+def test_bad_values_are_rejected():
+    with pytest.raises(InvalidRecord):
+        coerce("1.5", "int")
+    with pytest.raises(InvalidRecord):
+        coerce("tomorrow", "timestamp")
+
+
+def test_winner_is_derived_from_the_score():
+    row = validate("game_details", {
+        "game_id": "1", "season": "2024", "game_timestamp": "2025-04-16T02:00:00Z",
+        "home_team_id": "10", "away_team_id": "20", "home_points": "99", "away_points": "101",
+    })
+    assert row["winning_team_id"] == 20
+    assert row["game_timestamp"].startswith("2025-04-15")
+
+
+def team(team_id):
+    return json.dumps({"table": "teams", "row": {"team_id": team_id, "city": "A", "name": "B", "abbreviation": "C"}})
+
+
+def test_stdin_survives_a_failed_batch(monkeypatch, tmp_path):
+    applied = []
+
+    def apply(eng, batch):
+        if not applied:
+            applied.append(None)
+            raise RuntimeError("connection refused")
+        applied.append(len(batch))
+
+    monkeypatch.setattr(stream_ingest, "apply", apply)
+    monkeypatch.setattr(stream_ingest, "STREAM_BATCH_ROWS", 1)
+    monkeypatch.setattr(sys, "stdin", io.StringIO(f"{team(1)}\n{team(2)}\n"))
+    rejected = tmp_path / "rejected" / "stdin.rejected.ndjson"
+    stream_ingest.read_stdin(None, str(rejected))
+
+    # The failed batch is kept, in a form --stdin can replay, and the next batch still lands
+    assert applied == [None, 1]
+    [record] = [json.loads(line) for line in rejected.read_text().splitlines()]
+    assert (record["table"], record["row"]["team_id"]) == ("teams", 1)
+    assert record["error"] == "batch failed: connection refused"